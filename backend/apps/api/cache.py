@@ -0,0 +1,109 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db.models.base import ModelBase
+
+from ..recipes import models
+from ..recipes.shopping_list import get_shopping_list_version
+from ..recipes.versions import get_catalog_version
+
+RELATION_IDS_TIMEOUT = 60 * 5
+SHOPPING_CART_FILE_TIMEOUT = 60 * 60
+CATALOG_TIMEOUT = 60 * 60
+RELATION_FIELDS = {
+    models.Follow: ('follower', 'author_id'),
+    models.Favorite: ('user', 'recipe_id'),
+    models.ShoppingCart: ('user', 'recipe_id'),
+}
+
+
+class RelationIds:
+    """
+    Sorted array of related objects id.
+
+    Examples:
+    recipe.id in RelationIds([3, 1, 2])
+    """
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(ids))
+
+    def __contains__(self, obj_id):
+        index = bisect_left(self.ids, obj_id)
+        return index < len(self.ids) and self.ids[index] == obj_id
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _get_relation_key(relation_model: ModelBase, user_id: int) -> str:
+    """Cache key of user relations."""
+    return f'relation_ids:{relation_model._meta.model_name}:{user_id}'
+
+
+def get_relation_ids(relation_model: ModelBase, user) -> RelationIds:
+    """Get id of objects related to user through relation model."""
+    if not user.is_authenticated:
+        return RelationIds()
+    key = _get_relation_key(relation_model, user.id)
+    relation_ids = cache.get(key)
+    if relation_ids is None:
+        user_field, related_field = RELATION_FIELDS[relation_model]
+        relation_ids = RelationIds(
+            relation_model.objects.filter(
+                **{user_field: user}
+            ).values_list(related_field, flat=True)
+        )
+        cache.set(key, relation_ids, RELATION_IDS_TIMEOUT)
+    return relation_ids
+
+
+def clear_relation_ids(relation_model: ModelBase, user) -> None:
+    """Drop cached relations of user after they changed."""
+    cache.delete(_get_relation_key(relation_model, user.id))
+
+
+def get_tags_catalog() -> Dict[str, int]:
+    """Get id of tags by slug for current version of catalog."""
+    version = get_catalog_version(models.Tag)
+    key = f'tags_catalog:{version}'
+    tags = cache.get(key)
+    if tags is None:
+        tags = dict(models.Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tags, CATALOG_TIMEOUT)
+    return tags
+
+
+def get_tag_ids() -> RelationIds:
+    """Get id of all tags."""
+    return RelationIds(get_tags_catalog().values())
+
+
+def get_ingredient_ids() -> RelationIds:
+    """Get id of all ingredients for current version of catalog."""
+    version = get_catalog_version(models.Ingredient)
+    key = f'ingredients_catalog:{version}'
+    ingredient_ids = cache.get(key)
+    if ingredient_ids is None:
+        ingredient_ids = RelationIds(
+            models.Ingredient.objects.values_list('id', flat=True)
+        )
+        cache.set(key, ingredient_ids, CATALOG_TIMEOUT)
+    return ingredient_ids
+
+
+def get_shopping_cart_file_key(user, file_format: str) -> str:
+    """Cache key of shopping cart file by content of shopping list."""
+    version = get_shopping_list_version(user.id)
+    return f'shopping_cart_file:{user.id}:{file_format}:{version}'
+
+
+def get_shopping_cart_file(key: str) -> Optional[bytes]:
+    """Get rendered shopping cart file."""
+    return cache.get(key)
+
+
+def set_shopping_cart_file(key: str, content: bytes) -> None:
+    """Save rendered shopping cart file."""
+    cache.set(key, content, SHOPPING_CART_FILE_TIMEOUT)
@@ -1,35 +1,140 @@
 import base64
+import binascii
 import re
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-KEY_WORDS = ['data:image/', ';base64,']
-AVAILABLE_FORMATS = [
-    '(png)',
-    '(jpeg)',
-    '(jpg)'
-]
-REG_EX_BASE64 = (
-    r'data:image/[' + ', '.join(AVAILABLE_FORMATS) + ']+;base64,.+'
+AVAILABLE_FORMATS = ['png', 'jpeg', 'jpg']
+IMAGE_FORMATS = {'PNG': 'png', 'JPEG': 'jpg'}
+REG_EX_BASE64_HEADER = re.compile(
+    r'data:image/(' + '|'.join(AVAILABLE_FORMATS) + r');base64,'
 )
+DECODE_CHUNK_SIZE = 64 * 1024
 
 
-class Base64ImageField(serializers.ImageField):
-    """Image field what convert base64 to image."""
+def _get_absolute_url(field, url):
+    """Absolute url by request from context of field."""
+    request = field.context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+
+class VariantImageField(serializers.ImageField):
+    """
+    Image represented by url of resized variant when it is made.
+
+    Variant for list of objects can differ from variant for one object.
+    """
+    def __init__(self, variant='full', list_variant=None, **kwargs):
+        self.variant = variant
+        self.list_variant = list_variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        variant = self.variant
+        if self.list_variant and isinstance(
+                self.root, serializers.ListSerializer):
+            variant = self.list_variant
+        variants = getattr(value.instance, 'image_variants', None) or {}
+        name = variants.get(variant, {}).get('jpeg')
+        if not name:
+            return super().to_representation(value)
+        return _get_absolute_url(self, value.storage.url(name))
+
+
+class ImageVariantsField(serializers.Field):
+    """Urls of all made variants of image by size and format."""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        variants = getattr(value.instance, 'image_variants', None) or {}
+        return {
+            variant: {
+                extension: _get_absolute_url(self, value.storage.url(name))
+                for extension, name in names.items()
+            } for variant, names in variants.items()
+        }
+
+
+class Base64ImageField(VariantImageField):
+    """
+    Image field what convert base64 to image.
+
+    Only header of data is parsed, image is decoded by chunks
+    to temporary file and checked by Pillow. Extension of file is taken
+    from format found by Pillow, not from header.
+    """
     def to_internal_value(self, data):
-        if not re.match(REG_EX_BASE64, data):
+        header = (
+            REG_EX_BASE64_HEADER.match(data) if isinstance(data, str)
+            else None
+        )
+        if not header:
             raise ValidationError('Image base64 wrong format.')
-
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            try:
-                data = ContentFile(
-                    base64.b64decode(imgstr),
-                    name='temp.' + ext
+        start = header.end()
+        max_size = settings.MAX_IMAGE_SIZE
+        if (len(data) - start) // 4 * 3 > max_size + 2:
+            raise ValidationError(
+                f'Image should be less {max_size} bytes.'
+            )
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for offset in range(start, len(data), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    data[offset:offset + DECODE_CHUNK_SIZE],
+                    validate=True
+                ))
+            if file.tell() > max_size:
+                raise ValidationError(
+                    f'Image should be less {max_size} bytes.'
                 )
-            except ValueError:
-                raise ValidationError('Image base64 wrong format.')
-        return data
+            ext = self._verify_image(file)
+        except (binascii.Error, ValueError) as error:
+            file.close()
+            raise ValidationError('Image base64 wrong format.') from error
+        except ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        return File(file, name='temp.' + ext)
+
+    def _verify_image(self, file):
+        """Check what file is image of available format, return extension."""
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+                image.verify()
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            raise ValidationError('File is not image.')
+        if image_format not in IMAGE_FORMATS:
+            raise ValidationError('Image format is not supported.')
+        return IMAGE_FORMATS[image_format]
+
+
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field checked by cached catalog of id without query."""
+    def __init__(self, get_catalog, **kwargs):
+        self.get_catalog = get_catalog
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.get_catalog():
+            self.fail('does_not_exist', pk_value=data)
+        return pk
@@ -1,22 +1,70 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramWordSimilarity)
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import FilterSet
 from django_filters import rest_framework as filters
 
+from ..recipes import models
+from .cache import get_tags_catalog
+
+
+def get_tags_choices():
+    """Choices of tags slug from cached catalog."""
+    return [(slug, slug) for slug in get_tags_catalog()]
+
 
 class RecipeFilterSet(FilterSet):
     """Recipe filter set."""
-    tags = filters.AllValuesMultipleFilter(field_name="tags__slug")
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tags_choices,
+        method='filter_tags'
+    )
     author = filters.CharFilter(field_name='author')
     is_favorited = filters.BooleanFilter(method='filter_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_shipping_cart')
+    search = filters.CharFilter(method='filter_search')
 
-    def filter_favorited(self, queryset, name, favorite):
+    def filter_tags(self, queryset, name, slugs):
+        tags_catalog = get_tags_catalog()
+        recipe_tags = models.Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[tags_catalog.get(slug) for slug in slugs]
+        )
+        return queryset.filter(Exists(recipe_tags))
+
+    def _filter_relation(self, queryset, relation_model, is_related):
+        """Filter recipes by EXISTS or NOT EXISTS relation with user."""
         user = self.request.user
-        if favorite:
-            return queryset.filter(in_favorite__user=user)
-        return queryset.exclude(in_favorite__user=user)
+        if not user.is_authenticated:
+            return queryset.none() if is_related else queryset
+        relation = Exists(relation_model.objects.filter(
+            user=user,
+            recipe_id=OuterRef('pk')
+        ))
+        return queryset.filter(relation if is_related else ~relation)
+
+    def filter_favorited(self, queryset, name, favorite):
+        return self._filter_relation(queryset, models.Favorite, favorite)
 
     def filter_shipping_cart(self, queryset, name, shipping_cart):
-        user = self.request.user
-        if shipping_cart:
-            return queryset.filter(in_cart__user=user)
-        return queryset.exclude(in_cart__user=user)
+        return self._filter_relation(
+            queryset,
+            models.ShoppingCart,
+            shipping_cart
+        )
+
+    def filter_search(self, queryset, name, text):
+        """Search by name and text, ordered by rank of match."""
+        query = SearchQuery(
+            text,
+            config=models.SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=text)
+        ).annotate(
+            rank=(
+                SearchRank(F('search_vector'), query)
+                + TrigramWordSimilarity(text, 'name')
+            )
+        ).order_by('-rank', '-id')
@@ -0,0 +1,62 @@
+from hashlib import md5
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+
+from ..recipes.versions import get_catalog_version
+from . import serializers, utils
+
+
+class CatalogCacheMixin:
+    """
+    Conditional GET of public catalog by version of catalog.
+
+    Response has strong ETag of version and query, request with same
+    If-None-Match header get 304 without db queries and serialization.
+    """
+    authentication_classes = []
+    catalog_max_age = 60
+
+    def get_etag(self, request):
+        version = get_catalog_version(self.queryset.model)
+        path = request.get_full_path()
+        return quote_etag(md5(f'{version}:{path}'.encode()).hexdigest())
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=self.catalog_max_age
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class BatchRelationsMixin:
+    """Change relations of user with list of objects in one request."""
+    def get_batch_response(self, request, relation_model):
+        serializer = serializers.BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return utils.get_response_for_batch_create_or_delete(
+            method=request.method,
+            relation_model=relation_model,
+            user=request.user,
+            ids=serializer.validated_data['ids']
+        )
@@ -1,12 +1,64 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from ..recipes.paginators import CountPaginator
+
+MAX_PAGE_SIZE = 100
+
+
+class KeysetPaginator(CursorPagination):
+    """
+    Paginator by position of last object in ordering of query.
+
+    Examples query:
+    https://localhost/api/recipes?cursor=&limit=5 (first page)
+    https://localhost/api/recipes?cursor=cD0xMjM%3D&limit=5
+    """
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return queryset.query.order_by or queryset.model._meta.ordering
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
 
 
 class PageLimitPaginator(PageNumberPagination):
     """
-    Paginator with query params: limit, page.
+    Paginator with query params: limit, page or cursor.
 
     Examples query:
     https://localhost/api/users?limit=5 (query limit on one pages)
     https://localhost/api/users?page=2
+    https://localhost/api/users?cursor= (pages by cursor without count)
     """
+    django_paginator_class = CountPaginator
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    keyset_paginator_class = KeysetPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if self.keyset_paginator_class.cursor_query_param in (
+                request.query_params):
+            self.keyset_paginator = self.keyset_paginator_class()
+            self.keyset_paginator.max_page_size = self.max_page_size
+            return self.keyset_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,96 @@
+import csv
+from io import BytesIO, StringIO
+from typing import Dict, Iterable, Iterator
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Base renderer of shopping cart rows to file chunks."""
+    charset = 'utf-8'
+
+    def stream(self, ingredients: Iterable[Dict]) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (list, tuple)):
+            return b''.join(self.stream(data))
+        return str(data).encode(self.charset or 'utf-8')
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    """Shopping cart as plain text."""
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            name = ingredient.get('name')
+            units = ingredient.get('measurement_unit')
+            total = ingredient.get('total')
+            yield f'{name} {total}{units}\n'.encode(self.charset)
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    """Shopping cart as csv table."""
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Количество', 'Единицы измерения')
+
+    def stream(self, ingredients):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.header)
+        for ingredient in ingredients:
+            writer.writerow((
+                ingredient.get('name'),
+                ingredient.get('total'),
+                ingredient.get('measurement_unit'),
+            ))
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode(self.charset)
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    """Shopping cart as pdf document, rendered at once."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def stream(self, ingredients):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+            )
+        buffer = BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        position = height - PDF_MARGIN
+        document.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        for ingredient in ingredients:
+            if position < PDF_MARGIN:
+                document.showPage()
+                document.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+                position = height - PDF_MARGIN
+            name = ingredient.get('name')
+            units = ingredient.get('measurement_unit')
+            total = ingredient.get('total')
+            document.drawString(
+                PDF_MARGIN,
+                position,
+                f'{name} {total}{units}'
+            )
+            position -= PDF_FONT_SIZE * 1.5
+        document.save()
+        yield buffer.getvalue()
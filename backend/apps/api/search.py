@@ -0,0 +1,73 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List
+
+from ..recipes import models
+from ..recipes.versions import get_catalog_version
+
+INGREDIENTS_SEARCH_LIMIT = 50
+MAX_CHAR = chr(0x10FFFF)
+
+
+def normalize(text: str) -> str:
+    """Fold case and replace ё with е."""
+    return text.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    In memory index of ingredients for autocomplete.
+
+    Index is rebuilt from db when version of ingredients in db changed.
+    Ingredients what name starts with text are ranked above ingredients
+    what name only contains text.
+    """
+    search_limit = INGREDIENTS_SEARCH_LIMIT
+
+    def __init__(self):
+        self.version = None
+        self.entries = ([], [])
+        self.lock = Lock()
+
+    def _build(self, version: str) -> None:
+        ingredients = sorted(
+            models.Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda ingredient: (
+                normalize(ingredient['name']),
+                ingredient['measurement_unit']
+            )
+        )
+        names = [normalize(ingredient['name']) for ingredient in ingredients]
+        self.entries = (names, ingredients)
+        self.version = version
+
+    def _actualize(self) -> None:
+        version = get_catalog_version(models.Ingredient)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self._build(version)
+
+    def all(self) -> List[Dict]:
+        """All ingredients ordered by name."""
+        self._actualize()
+        return self.entries[1]
+
+    def search(self, text: str) -> List[Dict]:
+        """Ingredients what name starts with or contains text."""
+        self._actualize()
+        limit = self.search_limit
+        names, ingredients = self.entries
+        text = normalize(text)
+        start = bisect_left(names, text)
+        end = bisect_left(names, text + MAX_CHAR, lo=start)
+        result = ingredients[start:min(end, start + limit)]
+        for index, name in enumerate(names):
+            if len(result) >= limit:
+                break
+            if text in name and not start <= index < end:
+                result.append(ingredients[index])
+        return result
+
+
+ingredient_index = IngredientIndex()
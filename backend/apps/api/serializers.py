@@ -1,21 +1,38 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import check_password
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
 
 from ..recipes import models
+from ..recipes.shopping_list import change_shopping_lists
 from . import fields
-from .utils import create_ingredients
+from .cache import get_ingredient_ids, get_tag_ids
+from .utils import create_ingredients, update_ingredients
 
 User = get_user_model()
 MAX_POSITIVE_VALUE = 32767
+MAX_ID = 2 ** 63 - 1
+MAX_BATCH_SIZE = 100
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """List of id of recipes or authors to change relations in batch."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Short information about recipe."""
+    image = fields.VariantImageField(variant='thumbnail', read_only=True)
+    image_variants = fields.ImageVariantsField(source='image')
+
     class Meta:
         model = models.Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -45,7 +62,7 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, author):
         """Check is user follow to author or not."""
         follows = self.context.get('follows')
-        return author in follows
+        return author.id in follows
 
 
 class UserSubscribeSerializer(serializers.ModelSerializer):
@@ -64,7 +81,7 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, author):
         """Check is user follow to author or not."""
         follows = self.context.get('follows')
-        return author in follows
+        return author.id in follows
 
 
 class PasswordSerializer(serializers.Serializer):
@@ -112,7 +129,7 @@ class RecipeIngredientSerializer(serializers.Serializer):
     amount = serializers.IntegerField()
 
     class Meta:
-        model = models.IngredientAmount
+        model = models.RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
     def validate_amount(self, amount):
@@ -137,8 +154,18 @@ class RecipeIngredientSerializer(serializers.Serializer):
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for ingredient."""
     author = UserSerializer(read_only=True)
-    ingredients = RecipeIngredientSerializer(many=True)
-    image = fields.Base64ImageField()
+    ingredients = RecipeIngredientSerializer(
+        many=True,
+        source='recipe_ingredients'
+    )
+    tags = fields.CatalogPrimaryKeyRelatedField(
+        many=True,
+        allow_empty=False,
+        queryset=models.Tag.objects.all(),
+        get_catalog=get_tag_ids
+    )
+    image = fields.Base64ImageField(variant='full', list_variant='card')
+    image_variants = fields.ImageVariantsField(source='image')
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -146,18 +173,21 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = models.Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time',
         )
 
     def get_is_favorited(self, recipe):
         """Show recipe in favorite or not."""
-        favorites = self.context.get('favorites')
-        return recipe in favorites
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
+        return recipe.id in self.context.get('favorites')
 
     def get_is_in_shopping_cart(self, recipe):
         """Show recipe in shopping cart or not."""
-        shoppings = self.context.get('shoppings')
-        return recipe in shoppings
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
+        return recipe.id in self.context.get('shoppings')
 
     def validate_ingredients(self, ingredients):
         if len(ingredients) == 0:
@@ -165,9 +195,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_id = [
             ingredient.get('id') for ingredient in ingredients
         ]
-        existed_ingredients = models.Ingredient.objects.filter(
-            id__in=ingredients_id)
-        if len(existed_ingredients) != len(set(ingredients_id)):
+        if len(ingredients_id) != len(set(ingredients_id)):
+            raise ValidationError('Ingredients should be unique.')
+        ingredient_ids = get_ingredient_ids()
+        if any(
+            ingredient_id not in ingredient_ids
+            for ingredient_id in ingredients_id
+        ):
             raise ValidationError('Ingredient not found.')
         return ingredients
 
@@ -176,22 +210,25 @@ class RecipeSerializer(serializers.ModelSerializer):
         result['tags'] = TagSerializer(instance.tags, many=True).data
         return result
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
+        ingredients_data = validated_data.pop('recipe_ingredients')
         validated_data['author'] = self.context.get('request').user
         recipe = models.Recipe.objects.create(**validated_data)
-        ingredients = create_ingredients(ingredients_data)
-        recipe.ingredients.set(ingredients)
-        recipe.tags.set(tags)
+        create_ingredients(recipe, ingredients_data)
+        recipe.tags.add(*tags)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        models.Recipe.objects.select_for_update().filter(
+            id=instance.id
+        ).values_list('id').get()
         tags = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
+        ingredients_data = validated_data.pop('recipe_ingredients')
         instance = super().update(instance, validated_data)
-        ingredients = create_ingredients(ingredients_data)
-        instance.ingredients.clear()
-        instance.ingredients.set(ingredients)
+        difference = update_ingredients(instance, ingredients_data)
         instance.tags.set(tags)
+        change_shopping_lists(instance.id, difference)
         return instance
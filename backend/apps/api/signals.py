@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from ..recipes import models
+from ..recipes.paginators import clear_counts
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=models.Recipe)
+@receiver(post_delete, sender=models.Recipe)
+@receiver(m2m_changed, sender=models.Recipe.tags.through)
+@receiver(post_save, sender=models.Favorite)
+@receiver(post_delete, sender=models.Favorite)
+@receiver(post_save, sender=models.ShoppingCart)
+@receiver(post_delete, sender=models.ShoppingCart)
+def clear_recipe_counts(**kwargs):
+    """Drop cached counts of recipes lists."""
+    clear_counts(models.Recipe)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=models.Follow)
+@receiver(post_delete, sender=models.Follow)
+def clear_user_counts(**kwargs):
+    """Drop cached counts of users lists."""
+    clear_counts(User)
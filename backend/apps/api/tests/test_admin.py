@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from ...recipes import models
+from .utils import delete_tags
+
+User = get_user_model()
+
+
+class AdminChangeListTestCase(APITestCase):
+    """Testing of admin lists at many rows."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@mail.ru',
+            password='Qwerty123'
+        )
+        cls.tag = models.Tag.objects.create(
+            name='Завтрак',
+            color='#ff0000',
+            slug='breakfast'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        delete_tags()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_authors_with_recipes(self, count):
+        start = models.Recipe.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create(
+                email=f'admin_author_{number}@mail.ru',
+                username=f'admin_author_{number}',
+            )
+            recipe = models.Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                image='image.jpeg',
+                text='Рецепт',
+                cooking_time=1
+            )
+            recipe.tags.add(self.tag)
+            models.Favorite.objects.create(user=self.admin, recipe=recipe)
+
+    def get_queries_count(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_queries_not_depend_on_rows(self):
+        """Queries count of lists does not grow with count of rows."""
+        urls = [
+            reverse('admin:recipes_recipe_changelist'),
+            reverse('admin:auth_user_changelist'),
+            reverse('admin:recipes_ingredient_changelist'),
+        ]
+        self.create_authors_with_recipes(2)
+        few_rows = [self.get_queries_count(url) for url in urls]
+        self.create_authors_with_recipes(10)
+        many_rows = [self.get_queries_count(url) for url in urls]
+        self.assertEqual(few_rows, many_rows)
+
+    def test_recipe_changelist_shows_favorites_count(self):
+        """Favorites count of recipe is shown from counter."""
+        self.create_authors_with_recipes(1)
+        response = self.client.get(
+            reverse('admin:recipes_recipe_changelist'),
+            {'q': 'Рецепт 0'}
+        )
+        self.assertContains(response, 'field-favorites_count">1<')
+
+    def test_recipe_change_page_with_autocomplete(self):
+        """Change page of recipe does not list all ingredients."""
+        self.create_authors_with_recipes(1)
+        recipe = models.Recipe.objects.get()
+        ingredient = models.Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='г'
+        )
+        recipe.ingredients.add(ingredient, through_defaults={'amount': 5})
+        models.Ingredient.objects.create(name='Перец', measurement_unit='г')
+        response = self.client.get(
+            reverse('admin:recipes_recipe_change', args=[recipe.id]))
+        self.assertContains(response, 'Соль г')
+        self.assertNotContains(response, 'Перец г')
+
+    def test_recipe_change_updates_shopping_lists(self):
+        """Shopping lists are changed by ingredients edited in admin."""
+        self.create_authors_with_recipes(1)
+        recipe = models.Recipe.objects.get()
+        salt = models.Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='г'
+        )
+        recipe.ingredients.add(salt, through_defaults={'amount': 5})
+        models.ShoppingCart.objects.create(user=self.admin, recipe=recipe)
+        recipe_ingredient = recipe.recipe_ingredients.get()
+        recipe_tag = models.Recipe.tags.through.objects.get(recipe=recipe)
+        data = {
+            'name': recipe.name,
+            'author': recipe.author_id,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'recipe_ingredients-TOTAL_FORMS': 1,
+            'recipe_ingredients-INITIAL_FORMS': 1,
+            'recipe_ingredients-0-id': recipe_ingredient.id,
+            'recipe_ingredients-0-recipe': recipe.id,
+            'recipe_ingredients-0-ingredient': salt.id,
+            'recipe_ingredients-0-amount': 15,
+            'Recipe_tags-TOTAL_FORMS': 1,
+            'Recipe_tags-INITIAL_FORMS': 1,
+            'Recipe_tags-0-id': recipe_tag.id,
+            'Recipe_tags-0-recipe': recipe.id,
+            'Recipe_tags-0-tag': self.tag.id,
+        }
+        response = self.client.post(
+            reverse('admin:recipes_recipe_change', args=[recipe.id]),
+            data
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(models.ShoppingListItem.objects.filter(
+                user=self.admin
+            ).values_list('ingredient_id', 'total')),
+            [(salt.id, 15)]
+        )
@@ -1,8 +1,11 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -93,9 +96,10 @@ class FavoriteRecipeAPITestCase(APITestCase):
             'Favorite was not added'
         )
         expected_data = {
-            'id': 1,
+            'id': self.recipe.id,
             'name': 'Рецепт.',
             'image': '/media/image.jpeg',
+            'image_variants': {},
             'cooking_time': 60
         }
         self.assertEqual(response.data, expected_data)
@@ -148,3 +152,100 @@ class FavoriteRecipeAPITestCase(APITestCase):
             favorite.exists(),
             'Recipe not removed.'
         )
+
+    def test_add_recipe_to_favorite_not_load_relations(self):
+        """Relations of user are not loaded when recipe added to favorite."""
+        url = reverse('recipe-manage-favorites', kwargs={'pk': self.recipe.id})
+        with mock.patch(
+                'apps.api.cache.get_relation_ids') as get_relation_ids:
+            response = self.client.post(url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        get_relation_ids.assert_not_called()
+
+    def test_favorite_toggle_by_one_statement(self):
+        """Adding and removing favorite write relation by one query."""
+        url = reverse('recipe-manage-favorites', kwargs={'pk': self.recipe.id})
+        self.client.post(url, headers=self.headers_authorized)
+        self.client.delete(url, headers=self.headers_authorized)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_favorite' in query['sql']
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('ON CONFLICT DO NOTHING', statements[0])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(
+                url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_favorite' in query['sql']
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('RETURNING', statements[0])
+
+    def test_add_recipes_to_favorite_batch(self):
+        """Recipes are added by list with status for each id."""
+        url = reverse('recipe-manage-favorites-batch')
+        missing_id = models.Recipe.objects.order_by('-id').first().id + 1
+        response = self.client.post(
+            url,
+            data={'ids': [
+                self.recipe.id, self.recipe_favorite.id, missing_id,
+                self.recipe.id,
+            ]},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': self.recipe.id, 'status': status.HTTP_201_CREATED},
+            {
+                'id': self.recipe_favorite.id,
+                'status': status.HTTP_400_BAD_REQUEST
+            },
+            {'id': missing_id, 'status': status.HTTP_404_NOT_FOUND},
+        ])
+        self.assertTrue(models.Favorite.objects.filter(
+            user=self.user, recipe=self.recipe).exists())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_remove_recipes_from_favorite_batch(self):
+        """Recipes are removed by list with status for each id."""
+        url = reverse('recipe-manage-favorites-batch')
+        response = self.client.delete(
+            url,
+            data={'ids': [self.recipe_favorite.id, self.recipe.id]},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.data['results'], [
+            {
+                'id': self.recipe_favorite.id,
+                'status': status.HTTP_204_NO_CONTENT
+            },
+            {'id': self.recipe.id, 'status': status.HTTP_400_BAD_REQUEST},
+        ])
+        self.assertFalse(models.Favorite.objects.filter(
+            user=self.user, recipe=self.recipe_favorite).exists())
+
+    def test_favorite_batch_wrong_ids(self):
+        """Empty or too long list of id is not accepted."""
+        url = reverse('recipe-manage-favorites-batch')
+        for ids in [[], list(range(1, 102)), ['recipe']]:
+            response = self.client.post(
+                url,
+                data={'ids': ids},
+                format='json',
+                headers=self.headers_authorized
+            )
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_400_BAD_REQUEST
+            )
+        response = self.client.post(url, data={'ids': [self.recipe.id]})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
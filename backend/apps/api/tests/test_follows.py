@@ -3,6 +3,7 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -55,6 +56,9 @@ class SubscriptionAPITestCase(APITestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_user_subscription_not_authorized(self):
         """Get subsctiption for not authorized user."""
         url = reverse('user-get-subscriptions')
@@ -87,6 +91,72 @@ class SubscriptionAPITestCase(APITestCase):
         recipes_count = results.get('recipes_count')
         self.assertEqual(recipes_count, expected_recipe_count)
 
+    def test_subscribe_batch(self):
+        """Users are followed and unfollowed by list of id."""
+        other_author = User.objects.create(
+            email='batch_author@mail.ru',
+            username='batch_author',
+        )
+        url = reverse('user-subscribe-batch')
+        response = self.client.post(
+            url,
+            data={'ids': [other_author.id, self.author.id, self.user.id]},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': other_author.id, 'status': status.HTTP_201_CREATED},
+            {'id': self.author.id, 'status': status.HTTP_400_BAD_REQUEST},
+            {'id': self.user.id, 'status': status.HTTP_400_BAD_REQUEST},
+        ])
+        response = self.client.delete(
+            url,
+            data={'ids': [other_author.id, self.author.id]},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [status.HTTP_204_NO_CONTENT, status.HTTP_204_NO_CONTENT]
+        )
+        self.assertFalse(
+            models.Follow.objects.filter(follower=self.user).exists())
+
+    def test_subscription_recipes_limit_for_each_author(self):
+        """Last recipes of each author are limited in one query."""
+        other_author = User.objects.create(
+            email='other_author@mail.ru',
+            username='other_author',
+        )
+        other_recipes = models.Recipe.objects.bulk_create([
+            models.Recipe(
+                author=other_author,
+                name='Другой рецепт',
+                image='image.jpeg',
+                text='Рецепт',
+                cooking_time=1
+            ) for _ in range(3)
+        ])
+        models.Follow.objects.create(author=other_author, follower=self.user)
+        url = reverse('user-get-subscriptions') + '?recipes_limit=2'
+        with self.assertNumQueries(5):
+            response = self.client.get(url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {
+            author['id']: author for author in response.data['results']
+        }
+        self.assertEqual(
+            [recipe['id'] for recipe in results[other_author.id]['recipes']],
+            [recipe.id for recipe in other_recipes[::-1][:2]]
+        )
+        self.assertEqual(results[other_author.id]['recipes_count'], 3)
+        self.assertEqual(
+            [recipe['id'] for recipe in results[self.author.id]['recipes']],
+            [recipe.id for recipe in self.recipes[::-1][:2]]
+        )
+        self.assertEqual(results[self.author.id]['recipes_count'], 10)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class SubscriptionPaginationAPITestCase(APITestCase):
@@ -127,6 +197,9 @@ class SubscriptionPaginationAPITestCase(APITestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_subscription_pagination_with_limit_param(self):
         """Check pagination in subscription."""
         url = reverse('user-get-subscriptions')
@@ -140,6 +213,23 @@ class SubscriptionPaginationAPITestCase(APITestCase):
             'Unexpected result len.'
         )
 
+    def test_get_subscription_pagination_with_cursor_param(self):
+        """Check pagination by cursor in subscription."""
+        url = reverse('user-get-subscriptions') + '?cursor=&limit=1'
+        response = self.client.get(url, headers=self.headers_authorized)
+        self.assertEqual(
+            response.data.get('results')[0].get('id'),
+            self.another_author.id
+        )
+        response = self.client.get(
+            response.data.get('next'),
+            headers=self.headers_authorized
+        )
+        self.assertEqual(
+            response.data.get('results')[0].get('id'),
+            self.author.id
+        )
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class SubscribeAPITestCase(APITestCase):
@@ -176,6 +266,9 @@ class SubscribeAPITestCase(APITestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_subscribe_not_authorized_user(self):
         """Test case: not authorized user subscribe on author."""
         url = reverse('user-subscribe', kwargs={'pk': self.author.id})
@@ -249,3 +342,17 @@ class SubscribeAPITestCase(APITestCase):
             status.HTTP_204_NO_CONTENT,
             'User can unsubscribe from author.'
         )
+
+    def test_subscribe_changes_is_subscribed(self):
+        """Test case - is_subscribed follows subscribe and unsubscribe."""
+        url = reverse('user-subscribe', kwargs={'pk': self.author.id})
+        detail_url = reverse('user-detail', kwargs={'pk': self.author.id})
+        response = self.client.get(detail_url, headers=self.headers_authorized)
+        self.assertFalse(response.data.get('is_subscribed'))
+        response = self.client.post(url, headers=self.headers_authorized)
+        self.assertTrue(response.data.get('is_subscribed'))
+        response = self.client.get(detail_url, headers=self.headers_authorized)
+        self.assertTrue(response.data.get('is_subscribed'))
+        self.client.delete(url, headers=self.headers_authorized)
+        response = self.client.get(detail_url, headers=self.headers_authorized)
+        self.assertFalse(response.data.get('is_subscribed'))
@@ -1,9 +1,24 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
 from ...recipes import models
+from ...recipes.versions import clear_catalog_version
+from ..search import ingredient_index
 
 User = get_user_model()
 
@@ -65,3 +80,206 @@ class IngredientApiTestCase(APITestCase):
             }
         ]
         self.assertEqual(response.data, expected_data)
+
+
+class IngredientSearchApiTestCase(APITestCase):
+    """Search ingredients by in memory index."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ingredients = models.Ingredient.objects.bulk_create(
+            models.Ingredient(name=name, measurement_unit='г')
+            for name in ['Ёжевика', 'Свёкла', 'Морковь', 'Морковь по-корейски']
+        )
+        clear_catalog_version(models.Ingredient)
+
+    def search(self, text):
+        """Return names of found ingredients."""
+        url = reverse('ingredient-list') + '?search=' + text
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ingredient.get('name') for ingredient in response.data]
+
+    def test_prefix_ranked_above_substring(self):
+        """Ingredients starts with text are first."""
+        models.Ingredient.objects.create(
+            name='Сок морковный',
+            measurement_unit='мл'
+        )
+        self.assertEqual(
+            self.search('МОРК'),
+            ['Морковь', 'Морковь по-корейски', 'Сок морковный']
+        )
+
+    def test_search_with_yo(self):
+        """Letters ё and е are equal in search."""
+        self.assertEqual(self.search('ежевика'), ['Ёжевика'])
+        self.assertEqual(self.search('свеклА'), ['Свёкла'])
+        self.assertEqual(self.search('свёкла'), ['Свёкла'])
+
+    def test_search_without_queries(self):
+        """Search not query db when index is actual."""
+        self.search('морковь')
+        with self.assertNumQueries(0):
+            self.search('свекла')
+
+    def test_search_limit(self):
+        """Count of found ingredients is limited."""
+        with mock.patch.object(ingredient_index, 'search_limit', 1):
+            self.assertEqual(len(self.search('о')), 1)
+
+    def test_get_ingredients_not_modified(self):
+        """Get not modified ingredients by ETag."""
+        url = reverse('ingredient-list') + '?search=морковь'
+        etag = self.client.get(url).headers.get('ETag')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        other_url = reverse('ingredient-list') + '?search=свекла'
+        response = self.client.get(other_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        models.Ingredient.objects.create(name='Соль', measurement_unit='г')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AddIngredientsCommandTestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.csv_path = os.path.join(cls.temp_dir, 'ingredients.csv')
+        with open(cls.csv_path, 'w', encoding='utf-8') as file:
+            file.write('Капуста,кг\nморковь,г\nкартофель,г\n')
+        cls.json_path = os.path.join(cls.temp_dir, 'ingredients.json')
+        with open(cls.json_path, 'w', encoding='utf-8') as file:
+            json.dump([
+                {'name': 'капуста', 'measurement_unit': 'кг'},
+                {'name': 'соль', 'measurement_unit': 'г'},
+            ], file, ensure_ascii=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def add_ingredients(self, *args):
+        out = StringIO()
+        call_command('add_ingredients', *args, stdout=out)
+        return out.getvalue()
+
+    def test_add_ingredients_keeps_recipes(self):
+        """Existing ingredients of recipes are kept by loading."""
+        author = User.objects.create(username='author', email='a@mail.ru')
+        carrot = models.Ingredient.objects.create(
+            name='морковь',
+            measurement_unit='г'
+        )
+        recipe = models.Recipe.objects.create(
+            author=author,
+            name='Морковь',
+            image='image.jpeg',
+            text='Морковь',
+            cooking_time=10
+        )
+        recipe.ingredients.set([carrot], through_defaults={'amount': 100})
+        out = self.add_ingredients(self.csv_path)
+        self.assertIn(
+            'Добавлено ингредиентов: 2, обновлено: 0, без изменений: 1',
+            out
+        )
+        self.assertTrue(
+            models.RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient=carrot
+            ).exists()
+        )
+
+    def test_add_ingredients_again(self):
+        """Second loading of same file does not change catalog."""
+        self.add_ingredients(self.csv_path)
+        out = self.add_ingredients(self.csv_path)
+        self.assertIn(
+            'Добавлено ингредиентов: 0, обновлено: 0, без изменений: 3',
+            out
+        )
+        self.assertEqual(models.Ingredient.objects.count(), 3)
+
+    def test_add_ingredients_from_json(self):
+        """Name of existing ingredient in other case is updated."""
+        self.add_ingredients(self.csv_path)
+        out = self.add_ingredients(self.json_path)
+        self.assertIn(
+            'Добавлено ингредиентов: 1, обновлено: 1, без изменений: 0',
+            out
+        )
+        self.assertEqual(
+            sorted(models.Ingredient.objects.values_list('name', flat=True)),
+            ['капуста', 'картофель', 'морковь', 'соль']
+        )
+
+    def test_add_ingredients_with_duplicates(self):
+        """Repeated rows of file are counted apart from unchanged."""
+        path = os.path.join(self.temp_dir, 'duplicates.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('Перец,г\nперец,г\nПерец,г\nСоль,г\n')
+        out = self.add_ingredients(path)
+        self.assertIn(
+            'Добавлено ингредиентов: 2, обновлено: 0, без изменений: 0, '
+            'повторов в файле: 2',
+            out
+        )
+
+    def test_add_ingredients_unknown_format(self):
+        """File of unknown format is not loaded."""
+        with self.assertRaises(CommandError):
+            self.add_ingredients('ingredients.xml')
+
+
+class AddIngredientsProcessTestCase(APITransactionTestCase):
+    """Ingredients added by command run in other process."""
+    def setUp(self):
+        cache.clear()
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'ingredients.csv')
+        with open(self.csv_path, 'w', encoding='utf-8') as file:
+            file.write('Морковь,г\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def add_ingredients_in_process(self):
+        subprocess.run(
+            [sys.executable, 'manage.py', 'add_ingredients', self.csv_path],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'POSTGRES_DB': connection.settings_dict['NAME']
+            },
+            capture_output=True,
+            check=True
+        )
+
+    @mock.patch('apps.recipes.versions.CATALOG_VERSION_TIMEOUT', 0)
+    def test_catalog_version_changed_by_other_process(self):
+        """ETag of ingredients is changed by command of other process."""
+        url = reverse('ingredient-list') + '?search=морк'
+        response = self.client.get(url)
+        self.assertEqual(response.data, [])
+        etag = response.headers.get('ETag')
+        self.add_ingredients_in_process()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+    @mock.patch('apps.recipes.versions.CATALOG_VERSION_TIMEOUT', 0)
+    def test_index_rebuilt_after_other_process(self):
+        """Search finds ingredients added by command of other process."""
+        url = reverse('ingredient-list') + '?search=морк'
+        self.assertEqual(self.client.get(url).data, [])
+        self.add_ingredients_in_process()
+        response = self.client.get(url)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data],
+            ['Морковь']
+        )
@@ -1,15 +1,31 @@
+import base64
+import hashlib
+import json
+import os
 import shutil
 import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, override_settings
 
-from ...recipes import models
+from ...recipes import images, models
+from .. import cache as relation_cache
+from ..paginators import PageLimitPaginator
 from .utils import delete_tags
 
 User = get_user_model()
@@ -57,17 +73,16 @@ class RecipeApiTestCase(APITestCase):
             text='Возьмите столовую ложку...',
             cooking_time=10
         )
-        cls.recipe_ingredients = models.IngredientAmount.objects.create(
-            ingredient=cls.ingredient,
-            amount=1
-        )
         cls.tag = models.Tag.objects.create(
             name='Обед',
             color='#ffffff',
             slug='diner'
         )
         cls.recipe.tags.add(cls.tag)
-        cls.recipe.ingredients.add(cls.recipe_ingredients)
+        cls.recipe.ingredients.add(
+            cls.ingredient,
+            through_defaults={'amount': 1}
+        )
         models.ShoppingCart.objects.create(
             user=cls.user,
             recipe=cls.recipe
@@ -87,6 +102,9 @@ class RecipeApiTestCase(APITestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         delete_tags()
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_recipe_list(self):
         """Get list of recipes."""
         expected_data = [
@@ -120,12 +138,14 @@ class RecipeApiTestCase(APITestCase):
                 "is_in_shopping_cart": True,
                 "name": "Картофель отварной.",
                 "image": "http://testserver/media/image.jpeg",
+                "image_variants": {},
                 "text": "Возьмите столовую ложку...",
                 "cooking_time": 10
             }
         ]
         expected_data = {
             "count": 1,
+            "count_is_exact": True,
             "next": None,
             "previous": None,
             "results": expected_data
@@ -159,6 +179,9 @@ class RecipeApiTestCase(APITestCase):
             ],
             'tags': [self.tag.id],
         }
+        image_hash = hashlib.sha256(
+            base64.b64decode(post_data['image'].split(',')[1])
+        ).hexdigest()
         expected_data = {
             "tags": [
                 {
@@ -187,7 +210,11 @@ class RecipeApiTestCase(APITestCase):
             "is_favorited": False,
             "is_in_shopping_cart": False,
             "name": "Суп",
-            "image": "http://testserver/media/recipes/temp.jpg",
+            "image": (
+                f"http://testserver/media/recipes/{image_hash[:2]}/"
+                f"{image_hash}.png"
+            ),
+            "image_variants": {},
             "text": "Подготовьте воду...",
             "cooking_time": 10
         }
@@ -215,7 +242,7 @@ class RecipeApiTestCase(APITestCase):
             "cooking_time": 10,
             "ingredients": [
                 {
-                    "id": self.recipe_ingredients.id,
+                    "id": self.ingredient.id,
                     "amount": 1
                 }
             ],
@@ -229,6 +256,67 @@ class RecipeApiTestCase(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def post_recipe_with_image(self, image):
+        """Create recipe with image and return response."""
+        data = {
+            "image": image,
+            "name": "Суп",
+            "text": "Подготовьте воду...",
+            "cooking_time": 10,
+            "ingredients": [
+                {
+                    "id": self.ingredient.id,
+                    "amount": 1
+                }
+            ],
+            'tags': [self.tag.id],
+        }
+        return self.client.post(
+            reverse('recipe-list'),
+            data=data,
+            format='json',
+            headers=self.headers_authorized
+        )
+
+    @override_settings(MAX_IMAGE_SIZE=50)
+    def test_create_recipe_with_too_big_image(self):
+        """Creation recipe with image bigger than max size."""
+        response = self.post_recipe_with_image(
+            "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABi"
+            "eywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAA"
+            "AACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=="
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+    def test_create_recipe_with_not_image(self):
+        """Creation recipe with base64 data what is not image."""
+        response = self.post_recipe_with_image(
+            'data:image/png;base64,'
+            + base64.b64encode('Не картинка'.encode()).decode()
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+    def test_create_recipe_with_image_of_other_format(self):
+        """Extension of image is taken from format of image, not header."""
+        buffer = BytesIO()
+        Image.new('RGB', (1, 1), 'white').save(buffer, 'JPEG')
+        response = self.post_recipe_with_image(
+            'data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode()
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['image'].endswith('.jpg'))
+
+    def test_create_recipe_with_broken_base64(self):
+        """Creation recipe with symbols not from base64 alphabet."""
+        response = self.post_recipe_with_image(
+            'data:image/png;base64,iVBORw0KGgo!!!!'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
     def test_create_recipe_with_wrong_amount_format(self):
         """Creation recipe with wrong amount format."""
         url = reverse('recipe-list')
@@ -242,7 +330,7 @@ class RecipeApiTestCase(APITestCase):
             "cooking_time": 10,
             "ingredients": [
                 {
-                    "id": self.recipe_ingredients.id,
+                    "id": self.ingredient.id,
                     "amount": 'one'
                 }
             ],
@@ -269,7 +357,7 @@ class RecipeApiTestCase(APITestCase):
             "cooking_time": 'ten minutes',
             "ingredients": [
                 {
-                    "id": self.recipe_ingredients.id,
+                    "id": self.ingredient.id,
                     "amount": 1
                 }
             ],
@@ -296,7 +384,7 @@ class RecipeApiTestCase(APITestCase):
             "cooking_time": 10,
             "ingredients": [
                 {
-                    "id": self.recipe_ingredients.id,
+                    "id": self.ingredient.id,
                     "amount": 1
                 }
             ],
@@ -310,6 +398,64 @@ class RecipeApiTestCase(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_recipe_with_repeated_ingredient(self):
+        """Creation recipe with same ingredient twice."""
+        url = reverse('recipe-list')
+        wrong_data = {
+            "image": "data:image/jpg;base64,iVBORw0KGgoAAAANSUhEUgAAAAEA"
+                     "AAABAgMAAABieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACX"
+                     "BIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOy"
+                     "YQAAAABJRU5ErkJggg==",
+            "name": "Суп",
+            "text": "Подготовьте воду...",
+            "cooking_time": 10,
+            "ingredients": [
+                {
+                    "id": self.ingredient.id,
+                    "amount": 1
+                },
+                {
+                    "id": self.ingredient.id,
+                    "amount": 2
+                }
+            ],
+            'tags': [self.tag.id],
+        }
+        response = self.client.post(
+            url,
+            data=wrong_data,
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_recipe_with_not_existing_ingredient(self):
+        """Creation recipe with ingredient missing in catalog."""
+        url = reverse('recipe-list')
+        wrong_data = {
+            "image": "data:image/jpg;base64,iVBORw0KGgoAAAANSUhEUgAAAAEA"
+                     "AAABAgMAAABieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACX"
+                     "BIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOy"
+                     "YQAAAABJRU5ErkJggg==",
+            "name": "Суп",
+            "text": "Подготовьте воду...",
+            "cooking_time": 10,
+            "ingredients": [
+                {
+                    "id": self.ingredient.id + 1,
+                    "amount": 1
+                }
+            ],
+            'tags': [self.tag.id],
+        }
+        response = self.client.post(
+            url,
+            data=wrong_data,
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_recipe_by_id(self):
         """Get recipe by id."""
         expected_data = {
@@ -342,6 +488,7 @@ class RecipeApiTestCase(APITestCase):
             "is_in_shopping_cart": False,
             "name": "Картофель отварной.",
             "image": "http://testserver/media/image.jpeg",
+            "image_variants": {},
             "text": "Возьмите столовую ложку...",
             "cooking_time": 10
         }
@@ -418,6 +565,7 @@ class RecipeApiTestCase(APITestCase):
             "is_in_shopping_cart": False,
             "name": "Суп",
             "image": "http://testserver/media/image.jpeg",
+            "image_variants": {},
             "text": "Подготовьте воду...",
             "cooking_time": 20
         }
@@ -430,6 +578,49 @@ class RecipeApiTestCase(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, expected_data)
+        self.assertEqual(
+            models.RecipeIngredient.objects.filter(
+                ingredient=self.ingredient
+            ).count(),
+            1,
+            'Old ingredients of recipe were not deleted.'
+        )
+
+    def test_update_amount_of_recipe_ingredient(self):
+        """Update of one amount changes only row of this ingredient."""
+        recipe_ingredient = models.RecipeIngredient.objects.get(
+            recipe=self.recipe
+        )
+        post_data = {
+            "name": self.recipe.name,
+            "text": self.recipe.text,
+            "cooking_time": self.recipe.cooking_time,
+            "ingredients": [
+                {
+                    "id": self.ingredient.id,
+                    "amount": 5
+                }
+            ],
+            'tags': [self.tag.id],
+        }
+        url = reverse('recipe-detail', kwargs={'pk': self.recipe.id})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                url,
+                data=post_data,
+                format='json',
+                headers=self.headers_authorized_author
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe_ingredient.refresh_from_db()
+        self.assertEqual(recipe_ingredient.amount, 5)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if '"recipes_recipeingredient"' in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].startswith('UPDATE'))
 
     def test_delete_recipe_unauthorized_user(self):
         """Delete recipe unauthorized user."""
@@ -509,6 +700,9 @@ class RecipePaginationApiTestCase(APITestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_recipe_list_pagination(self):
         """Check pagination when get recipes list."""
         expected_len = 6
@@ -536,6 +730,108 @@ class RecipePaginationApiTestCase(APITestCase):
         result = response.data.get('results')
         self.assertEqual(len(result), expected_len)
 
+    def test_get_recipe_list_pagination_with_cursor_param(self):
+        """Check pagination by cursor when get recipes list."""
+        url = reverse('recipe-list') + '?cursor=&limit=5'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        first_page = [recipe.get('id') for recipe in response.data['results']]
+        response = self.client.get(response.data.get('next'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        second_page = [recipe.get('id') for recipe in response.data['results']]
+        self.assertIsNone(response.data.get('next'))
+        expected_ids = list(
+            models.Recipe.objects.values_list('id', flat=True)
+        )
+        self.assertEqual(first_page + second_page, expected_ids)
+
+    def test_get_recipe_list_pagination_with_too_big_limit(self):
+        """Limit of page can not be more than max page size."""
+        url = reverse('recipe-list') + '?limit=1000'
+        with mock.patch.object(PageLimitPaginator, 'max_page_size', 4):
+            response = self.client.get(url)
+            cursor_response = self.client.get(url + '&cursor=')
+        self.assertEqual(len(response.data.get('results')), 4)
+        self.assertEqual(len(cursor_response.data.get('results')), 4)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RecipeCountApiTestCase(APITestCase):
+    """Count of recipes in paginated list."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email='count_user@mail.ru',
+            username='count_user',
+        )
+        cls.recipes = models.Recipe.objects.bulk_create(
+            models.Recipe(
+                author=cls.user,
+                name='Рецепт',
+                image='image.jpeg',
+                text='Рецепт',
+                cooking_time=10
+            ) for _ in range(3)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_count_queries(self, url):
+        """Return count from response and count queries of request."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        queries = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT COUNT(*)')
+        ]
+        return response.data.get('count'), len(queries)
+
+    def test_count_is_cached(self):
+        """Count is taken from cache on second request."""
+        url = reverse('recipe-list')
+        self.assertEqual(self.get_count_queries(url), (3, 1))
+        self.assertEqual(self.get_count_queries(url), (3, 0))
+        self.assertEqual(
+            self.get_count_queries(url + f'?author={self.user.id}'),
+            (3, 1),
+            'Count should be cached for each filters.'
+        )
+
+    def test_count_cache_cleared_after_recipe_changed(self):
+        """Cached count is dropped after recipe created or deleted."""
+        url = reverse('recipe-list')
+        self.assertEqual(self.get_count_queries(url), (3, 1))
+        recipe = models.Recipe.objects.create(
+            author=self.user,
+            name='Новый рецепт',
+            image='image.jpeg',
+            text='Рецепт',
+            cooking_time=10
+        )
+        self.assertEqual(self.get_count_queries(url), (4, 1))
+        recipe.delete()
+        self.assertEqual(self.get_count_queries(url), (3, 1))
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_estimated_count(self):
+        """Count of not filtered list is estimated for big table."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE recipes_recipe')
+        url = reverse('recipe-list')
+        response = self.client.get(url)
+        self.assertFalse(response.data.get('count_is_exact'))
+        response = self.client.get(url + f'?author={self.user.id}')
+        self.assertTrue(response.data.get('count_is_exact'))
+        self.assertEqual(response.data.get('count'), 3)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class RecipeSearchParamsApiTestCase(APITestCase):
@@ -611,6 +907,9 @@ class RecipeSearchParamsApiTestCase(APITestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         delete_tags()
 
+    def setUp(self):
+        cache.clear()
+
     def test_is_favorited_search_param(self):
         """Check is_favorited search param."""
         is_favorited = 1
@@ -639,6 +938,30 @@ class RecipeSearchParamsApiTestCase(APITestCase):
             1
         )
 
+    def test_not_favorited_search_param(self):
+        """Check is_favorited=0 and is_in_shopping_cart=0 search params."""
+        url = reverse('recipe-list')
+        for param in ['is_favorited', 'is_in_shopping_cart']:
+            response = self.client.get(
+                url + f'?{param}=0',
+                headers=self.headers_authorized
+            )
+            recipes = [
+                recipe.get('id') for recipe in response.data.get('results')
+            ]
+            self.assertEqual(
+                recipes,
+                [self.recipe_no_tag.id, self.recipe_diner.id]
+            )
+
+    def test_favorited_search_param_unauthorized_user(self):
+        """Check is_favorited search params of unauthorized user."""
+        url = reverse('recipe-list')
+        response = self.client.get(url + '?is_favorited=1')
+        self.assertEqual(response.data.get('count'), 0)
+        response = self.client.get(url + '?is_favorited=0')
+        self.assertEqual(response.data.get('count'), 3)
+
     def test_author_search_param(self):
         """Check author search param."""
         author_id = self.author_lunch.id
@@ -693,3 +1016,688 @@ class RecipeSearchParamsApiTestCase(APITestCase):
             len(response.data.get('results')),
             2,
         )
+
+    def test_several_tags_of_one_recipe_search_params(self):
+        """Recipe with several searched tags returned once."""
+        self.recipe_lunch.tags.add(self.diner_tag)
+        url = reverse('recipe-list')
+        url += f'?tags={self.diner_tag.slug}&tags={self.lunch_tag.slug}'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, headers=self.headers_authorized)
+        recipes = [recipe.get('id') for recipe in response.data['results']]
+        self.assertEqual(recipes, [self.recipe_diner.id, self.recipe_lunch.id])
+        self.assertEqual(response.data.get('count'), 2)
+        for query in context.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_not_existing_tag_search_param(self):
+        """Search by not existing tag."""
+        url = reverse('recipe-list') + '?tags=not_existing'
+        response = self.client.get(url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RecipeQueryCountApiTestCase(APITestCase):
+    """Number of queries does not depend on page size."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email='query_user@mail.ru',
+            username='query_user',
+        )
+        token_user = Token.objects.create(user=cls.user).key
+        cls.headers_authorized = {
+            'Authorization': f"Token {token_user}"
+        }
+        cls.tags = [
+            models.Tag.objects.create(
+                name=f'Тег {number}',
+                color=f'#00000{number}',
+                slug=f'tag_{number}'
+            ) for number in range(2)
+        ]
+        ingredients = [
+            models.Ingredient.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            ) for number in range(2)
+        ]
+        for number in range(12):
+            author = User.objects.create(
+                email=f'query_author_{number}@mail.ru',
+                username=f'query_author_{number}',
+            )
+            recipe = models.Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                image='image.jpeg',
+                text='Рецепт',
+                cooking_time=10
+            )
+            recipe.tags.set(cls.tags)
+            recipe.ingredients.set(
+                ingredients,
+                through_defaults={'amount': number + 1}
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        delete_tags()
+
+    def setUp(self):
+        cache.clear()
+
+    def get_queries_count(self, url, headers=None):
+        """Return number of cached queries executed for request."""
+        self.client.get(url, headers=headers)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_recipe_list_queries_not_depend_on_limit(self):
+        """Queries count of recipes list is constant."""
+        url = reverse('recipe-list')
+        for headers in [None, self.headers_authorized]:
+            small_page = self.get_queries_count(f'{url}?limit=2', headers)
+            large_page = self.get_queries_count(f'{url}?limit=12', headers)
+            self.assertEqual(small_page, large_page)
+
+    def test_recipe_detail_queries(self):
+        """Recipe detail loads relations in constant queries."""
+        recipe = models.Recipe.objects.first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        list_url = reverse('recipe-list')
+        self.assertEqual(
+            self.get_queries_count(url),
+            self.get_queries_count(f'{list_url}?limit=12'),
+            'Detail should make same queries as list with cached count.'
+        )
+
+    def test_recipe_list_queries_not_depend_on_favorites(self):
+        """Queries count does not grow with favorites and cart of user."""
+        url = reverse('recipe-list') + '?limit=12'
+        without_relations = self.get_queries_count(
+            url,
+            self.headers_authorized
+        )
+        for recipe in models.Recipe.objects.all():
+            models.Favorite.objects.create(user=self.user, recipe=recipe)
+            models.ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        with_relations = self.get_queries_count(url, self.headers_authorized)
+        self.assertEqual(without_relations, with_relations)
+        response = self.client.get(url, headers=self.headers_authorized)
+        for recipe in response.data.get('results'):
+            self.assertTrue(recipe.get('is_favorited'))
+            self.assertTrue(recipe.get('is_in_shopping_cart'))
+
+    def test_recipe_list_loads_only_follows(self):
+        """Recipes list reads only follows of user from context."""
+        url = reverse('recipe-list') + '?limit=12'
+        with mock.patch(
+                'apps.api.cache.get_relation_ids',
+                wraps=relation_cache.get_relation_ids) as get_relation_ids:
+            response = self.client.get(url, headers=self.headers_authorized)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        get_relation_ids.assert_called_once_with(models.Follow, self.user)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RecipeFullTextSearchApiTestCase(APITestCase):
+    """Testing of search by name and text of recipe."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email='search_user@mail.ru',
+            username='search_user',
+        )
+        cls.soup = models.Recipe.objects.create(
+            author=cls.user,
+            name='Гороховый суп',
+            image='image.jpeg',
+            text='Замочите горох на ночь.',
+            cooking_time=60
+        )
+        cls.porridge = models.Recipe.objects.create(
+            author=cls.user,
+            name='Гороховая каша',
+            image='image.jpeg',
+            text='Подавайте вместо супа.',
+            cooking_time=30
+        )
+        cls.salad = models.Recipe.objects.create(
+            author=cls.user,
+            name='Салат',
+            image='image.jpeg',
+            text='Нарежьте овощи.',
+            cooking_time=10
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, text):
+        """Return id of found recipes."""
+        url = reverse('recipe-list') + f'?search={text}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe.get('id') for recipe in response.data['results']]
+
+    def test_search_by_word_form(self):
+        """Search finds other forms of word, name is ranked above text."""
+        self.assertEqual(self.search('супы'), [self.soup.id, self.porridge.id])
+
+    def test_search_with_typo(self):
+        """Search finds name with typo."""
+        self.assertEqual(self.search('салатт'), [self.salad.id])
+
+    def test_search_after_recipe_changed(self):
+        """Search vector is updated after recipe saved."""
+        self.salad.text = 'Добавьте горох.'
+        self.salad.save(update_fields=['text'])
+        self.assertIn(self.salad.id, self.search('горох'))
+        self.assertEqual(self.search('огурец'), [])
+
+
+class DeleteIngredientAmountsCommandTestCase(APITestCase):
+    def test_delete_ingredient_amounts_by_batches(self):
+        """Not used ingredient amounts are deleted by several batches."""
+        ingredient = models.Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='г'
+        )
+        models.IngredientAmount.objects.bulk_create(
+            models.IngredientAmount(ingredient=ingredient, amount=amount)
+            for amount in range(1, 6)
+        )
+        with CaptureQueriesContext(connection) as context:
+            call_command(
+                'delete_ingredient_amounts',
+                batch_size=2,
+                stdout=StringIO()
+            )
+        self.assertFalse(models.IngredientAmount.objects.exists())
+        deletes = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), 3)
+
+
+class RecipeExportImportCommandTestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(
+            email='author@mail.ru',
+            username='recipe_author',
+            first_name='author',
+        )
+        self.tag = models.Tag.objects.create(
+            name='Обед',
+            color='#ffffff',
+            slug='diner'
+        )
+        self.potato = models.Ingredient.objects.create(
+            name='Картофель',
+            measurement_unit='г'
+        )
+        for name in ['Картофель отварной', 'Картофельное пюре']:
+            recipe = models.Recipe.objects.create(
+                author=self.author,
+                name=name,
+                image='recipes/image.jpeg',
+                text='Отварите картофель.',
+                cooking_time=20
+            )
+            recipe.tags.set([self.tag])
+            recipe.ingredients.set(
+                [self.potato],
+                through_defaults={'amount': 100}
+            )
+
+    def export(self):
+        """Export recipes to file and return its path."""
+        path = os.path.join(self.temp_dir, 'recipes.jsonl')
+        call_command('export_recipes', path, stderr=StringIO())
+        return path
+
+    def test_export_recipes(self):
+        """Recipes exported as one line of JSON for each recipe."""
+        out = StringIO()
+        call_command('export_recipes', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0]), {
+            'author': {
+                'username': 'recipe_author',
+                'email': 'author@mail.ru',
+                'first_name': 'author',
+                'last_name': '',
+            },
+            'name': 'Картофель отварной',
+            'text': 'Отварите картофель.',
+            'image': 'recipes/image.jpeg',
+            'cooking_time': 20,
+            'tags': [{'name': 'Обед', 'color': '#ffffff', 'slug': 'diner'}],
+            'ingredients': [
+                {'name': 'Картофель', 'measurement_unit': 'г', 'amount': 100}
+            ],
+        })
+
+    def test_import_recipes_to_empty_db(self):
+        """Authors, tags, ingredients and recipes are created by import."""
+        path = self.export()
+        User.objects.all().delete()
+        models.Tag.objects.all().delete()
+        models.Ingredient.objects.all().delete()
+        call_command('import_recipes', path, batch_size=1, stdout=StringIO())
+        recipe = models.Recipe.objects.get(name='Картофель отварной')
+        self.assertEqual(recipe.author.username, 'recipe_author')
+        self.assertFalse(recipe.author.has_usable_password())
+        self.assertEqual(
+            list(recipe.tags.values_list('slug', flat=True)),
+            ['diner']
+        )
+        self.assertEqual(
+            list(recipe.recipe_ingredients.values_list(
+                'ingredient__name', 'amount'
+            )),
+            [('Картофель', 100)]
+        )
+        self.assertEqual(models.Recipe.objects.count(), 2)
+        self.assertEqual(models.Ingredient.objects.count(), 1)
+        response = self.client.get(
+            reverse('recipe-list'),
+            {'search': 'пюре'}
+        )
+        self.assertEqual(response.data['count'], 1)
+
+    def test_import_existing_recipes_skipped(self):
+        """Recipes with same author and name are not imported again."""
+        path = self.export()
+        out = StringIO()
+        call_command('import_recipes', path, stdout=out)
+        self.assertIn('Загружено рецептов: 0, пропущено: 2', out.getvalue())
+        self.assertEqual(models.Recipe.objects.count(), 2)
+
+    def test_import_ingredient_in_other_case(self):
+        """Ingredients are matched by name in any case."""
+        path = self.export()
+        models.Recipe.objects.all().delete()
+        models.Ingredient.objects.filter(id=self.potato.id).update(
+            name='картофель'
+        )
+        out = StringIO()
+        call_command('import_recipes', path, stdout=out)
+        self.assertIn('Загружено рецептов: 2, пропущено: 0', out.getvalue())
+        self.assertEqual(models.Ingredient.objects.count(), 1)
+        self.assertEqual(
+            models.RecipeIngredient.objects.filter(
+                ingredient=self.potato
+            ).count(),
+            2
+        )
+
+    def test_import_wrong_line(self):
+        """Import is stopped on line without required fields."""
+        path = os.path.join(self.temp_dir, 'wrong.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"name": "Суп"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, stdout=StringIO())
+
+
+class RecipeImageVariantsTestCase(APITestCase):
+    """Testing of resized variants of recipe image."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.temp_dir)
+        cls.media_settings.enable()
+        cls.user = User.objects.create(
+            email='image_user@mail.ru',
+            username='image_user',
+        )
+        token = Token.objects.create(user=cls.user).key
+        cls.headers_authorized = {'Authorization': f"Token {token}"}
+        cls.ingredient = models.Ingredient.objects.create(
+            name='Свекла',
+            measurement_unit='г'
+        )
+        cls.tag = models.Tag.objects.create(
+            name='Ужин',
+            color='#000000',
+            slug='supper'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_settings.disable()
+        super().tearDownClass()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+        delete_tags()
+
+    def setUp(self):
+        cache.clear()
+        buffer = BytesIO()
+        Image.new('RGBA', (2000, 1000), (255, 0, 0, 128)).save(
+            buffer, 'PNG')
+        image_name = default_storage.save(
+            'recipes/images/beet.png',
+            ContentFile(buffer.getvalue())
+        )
+        self.recipe = models.Recipe.objects.create(
+            author=self.user,
+            name='Борщ',
+            image=image_name,
+            text='Сварите свеклу...',
+            cooking_time=60
+        )
+
+    def test_make_image_variants(self):
+        """Variants are saved in every size and format."""
+        images.update_image_variants(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        variants = self.recipe.image_variants
+        self.assertEqual(set(variants), set(images.IMAGE_VARIANTS))
+        for variant, size in images.IMAGE_VARIANTS.items():
+            self.assertEqual(
+                set(variants[variant]),
+                set(images.IMAGE_VARIANT_FORMATS)
+            )
+            with default_storage.open(variants[variant]['jpeg']) as file:
+                with Image.open(file) as image:
+                    self.assertEqual(image.format, 'JPEG')
+                    self.assertEqual(image.size, (size, size // 2))
+
+    def test_stale_recipe_save_keeps_variants(self):
+        """Recipe loaded before variants were made does not drop them."""
+        stale_recipe = models.Recipe.objects.get(id=self.recipe.id)
+        images.update_image_variants(self.recipe.id, self.recipe.image.name)
+        stale_recipe.name = 'Борщ украинский'
+        stale_recipe.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Борщ украинский')
+        self.assertEqual(
+            set(self.recipe.image_variants),
+            set(images.IMAGE_VARIANTS)
+        )
+
+    def test_admin_image_change_schedules_variants(self):
+        """Variants of image changed in admin are dropped and made again."""
+        images.update_image_variants(self.recipe.id, self.recipe.image.name)
+        self.recipe.ingredients.add(
+            self.ingredient,
+            through_defaults={'amount': 100}
+        )
+        self.recipe.tags.add(self.tag)
+        admin = User.objects.create_superuser(
+            username='image_admin',
+            email='image_admin@mail.ru',
+            password='Qwerty123'
+        )
+        self.client.force_login(admin)
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), 'blue').save(buffer, 'PNG')
+        buffer.name = 'new.png'
+        buffer.seek(0)
+        recipe_ingredient = self.recipe.recipe_ingredients.get()
+        recipe_tag = models.Recipe.tags.through.objects.get(
+            recipe=self.recipe
+        )
+        data = {
+            'name': self.recipe.name,
+            'author': self.user.id,
+            'text': self.recipe.text,
+            'cooking_time': self.recipe.cooking_time,
+            'image': buffer,
+            'recipe_ingredients-TOTAL_FORMS': 1,
+            'recipe_ingredients-INITIAL_FORMS': 1,
+            'recipe_ingredients-0-id': recipe_ingredient.id,
+            'recipe_ingredients-0-recipe': self.recipe.id,
+            'recipe_ingredients-0-ingredient': self.ingredient.id,
+            'recipe_ingredients-0-amount': 100,
+            'Recipe_tags-TOTAL_FORMS': 1,
+            'Recipe_tags-INITIAL_FORMS': 1,
+            'Recipe_tags-0-id': recipe_tag.id,
+            'Recipe_tags-0-recipe': self.recipe.id,
+            'Recipe_tags-0-tag': self.tag.id,
+        }
+        with mock.patch.object(images, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('admin:recipes_recipe_change',
+                            args=[self.recipe.id]),
+                    data
+                )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        old_image_name = self.recipe.image.name
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, old_image_name)
+        self.assertEqual(self.recipe.image_variants, {})
+        get_executor.return_value.submit.assert_called_once_with(
+            images.update_image_variants,
+            self.recipe.id,
+            self.recipe.image.name
+        )
+
+    def test_same_image_saved_once(self):
+        """Files with same content are saved once by hash of content."""
+        with default_storage.open(self.recipe.image.name) as file:
+            content = file.read()
+        name = default_storage.save(
+            'recipes/images/copy.PNG',
+            ContentFile(content)
+        )
+        self.assertEqual(name, self.recipe.image.name)
+        self.assertEqual(
+            name,
+            'recipes/images/{0}/{1}.png'.format(
+                hashlib.sha256(content).hexdigest()[:2],
+                hashlib.sha256(content).hexdigest()
+            )
+        )
+        directory = os.path.dirname(default_storage.path(name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_variants_of_replaced_image_not_saved(self):
+        """Variants of old image are not saved after image changed."""
+        old_name = self.recipe.image.name
+        models.Recipe.objects.filter(id=self.recipe.id).update(
+            image='recipes/images/other.png')
+        images.update_image_variants(self.recipe.id, old_name)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_recipe_image_urls_of_variants(self):
+        """Recipe list shows card variant, recipe detail full variant."""
+        images.update_image_variants(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        variants = self.recipe.image_variants
+        response = self.client.get(reverse('recipe-list'))
+        recipe = response.data['results'][0]
+        self.assertTrue(
+            recipe['image'].endswith(variants['card']['jpeg']))
+        self.assertTrue(
+            recipe['image_variants']['thumbnail']['webp'].endswith(
+                variants['thumbnail']['webp'])
+        )
+        response = self.client.get(
+            reverse('recipe-detail', args=[self.recipe.id]))
+        self.assertTrue(
+            response.data['image'].endswith(variants['full']['jpeg']))
+
+    def get_post_data(self):
+        """Data of new recipe with image."""
+        return {
+            "image": "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB"
+                     "AgMAAABieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA"
+                     "7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5E"
+                     "rkJggg==",
+            "name": "Винегрет",
+            "text": "Нарежьте свеклу...",
+            "cooking_time": 20,
+            "ingredients": [{"id": self.ingredient.id, "amount": 200}],
+            "tags": [self.tag.id],
+        }
+
+    def test_create_recipe_schedules_variants(self):
+        """Variants are made in process pool after recipe saved."""
+        post_data = self.get_post_data()
+        with mock.patch.object(images, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('recipe-list'),
+                    data=post_data,
+                    format='json',
+                    headers=self.headers_authorized
+                )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = models.Recipe.objects.get(id=response.data['id'])
+        get_executor.return_value.submit.assert_called_once_with(
+            images.update_image_variants,
+            recipe.id,
+            recipe.image.name
+        )
+
+    def test_broken_pool_replaced(self):
+        """Broken process pool is replaced by new one."""
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool()
+        with mock.patch.object(images, '_executor', broken), \
+                mock.patch.object(images, 'ProcessPoolExecutor') as pool:
+            with self.captureOnCommitCallbacks(execute=True):
+                images.schedule_image_variants(self.recipe)
+            self.assertIs(images._executor, pool.return_value)
+        broken.shutdown.assert_called_once_with(wait=False)
+        pool.return_value.submit.assert_called_once_with(
+            images.update_image_variants,
+            self.recipe.id,
+            self.recipe.image.name
+        )
+
+    def test_create_recipe_with_broken_pool(self):
+        """Recipe is saved when variants can not be scheduled."""
+        with mock.patch.object(images, 'get_executor') as get_executor:
+            get_executor.return_value.submit.side_effect = (
+                BrokenProcessPool()
+            )
+            with self.assertLogs(level='ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(
+                        reverse('recipe-list'),
+                        data=self.get_post_data(),
+                        format='json',
+                        headers=self.headers_authorized
+                    )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class CountersTestCase(APITestCase):
+    """Testing of counters of recipes, followers and favorites."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            email='counted_author@mail.ru',
+            username='counted_author',
+        )
+        cls.user = User.objects.create(
+            email='counting_user@mail.ru',
+            username='counting_user',
+        )
+        token = Token.objects.create(user=cls.user).key
+        cls.headers_authorized = {'Authorization': f"Token {token}"}
+
+    def setUp(self):
+        cache.clear()
+        self.recipes = models.Recipe.objects.bulk_create([
+            models.Recipe(
+                author=self.author,
+                name='Считаемый рецепт',
+                image='image.jpeg',
+                text='Рецепт',
+                cooking_time=1
+            ) for _ in range(3)
+        ])
+
+    def get_counters(self, user):
+        counters = models.AuthorCounters.objects.filter(user=user).first()
+        if counters is None:
+            return 0, 0
+        return counters.recipes_count, counters.followers_count
+
+    def test_recipes_count(self):
+        """Recipes count is changed on create, delete and author change."""
+        self.assertEqual(self.get_counters(self.author), (3, 0))
+        self.recipes[0].delete()
+        self.assertEqual(self.get_counters(self.author), (2, 0))
+        recipe = self.recipes[1]
+        recipe.author = self.user
+        recipe.save()
+        self.assertEqual(self.get_counters(self.author), (1, 0))
+        self.assertEqual(self.get_counters(self.user), (1, 0))
+
+    def test_followers_count(self):
+        """Followers count is changed on subscribe and unsubscribe."""
+        url = reverse('user-subscribe', args=[self.author.id])
+        self.client.post(url, headers=self.headers_authorized)
+        self.assertEqual(self.get_counters(self.author), (3, 1))
+        response = self.client.get(
+            reverse('user-get-subscriptions'),
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.data['results'][0]['recipes_count'], 3)
+        self.client.delete(url, headers=self.headers_authorized)
+        self.assertEqual(self.get_counters(self.author), (3, 0))
+
+    def test_favorites_count(self):
+        """Favorites count is changed and not overwritten by save."""
+        recipe = models.Recipe.objects.get(id=self.recipes[0].id)
+        url = reverse('recipe-manage-favorites', args=[recipe.id])
+        self.client.post(url, headers=self.headers_authorized)
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.client.delete(url, headers=self.headers_authorized)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_rebuild_counters(self):
+        """Wrong counters are counted again by command."""
+        models.Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        models.Recipe.objects.filter(id=self.recipes[0].id).update(
+            favorites_count=5)
+        models.AuthorCounters.objects.filter(user=self.author).update(
+            recipes_count=0, followers_count=7)
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        self.assertIn(
+            'Исправлено счетчиков рецептов: 1, авторов: 1',
+            out.getvalue()
+        )
+        self.assertEqual(self.get_counters(self.author), (3, 0))
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].favorites_count, 1)
@@ -0,0 +1,437 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, override_settings
+
+from ...recipes import models
+from ...recipes.shopping_list import (change_shopping_lists,
+                                      rebuild_shopping_lists)
+from ..views import RecipeViewSet
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DownloadShoppingCartAPITestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email='user@mail.ru',
+            username='user',
+        )
+        token_user = Token.objects.create(user=cls.user).key
+        cls.headers_authorized = {
+            'Authorization': f"Token {token_user}"
+        }
+        cls.potato = models.Ingredient.objects.create(
+            name='Картофель',
+            measurement_unit='г'
+        )
+        cls.salt = models.Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='щепотка'
+        )
+        cls.recipes = []
+        for potato_amount in [100, 200]:
+            recipe = models.Recipe.objects.create(
+                author=cls.user,
+                name='Картофель отварной',
+                image='image.jpeg',
+                text='Отварите картофель.',
+                cooking_time=20
+            )
+            models.RecipeIngredient.objects.bulk_create([
+                models.RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=cls.potato,
+                    amount=potato_amount
+                ),
+                models.RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=cls.salt,
+                    amount=1
+                ),
+            ])
+            cls.recipes.append(recipe)
+        models.ShoppingCart.objects.create(
+            user=cls.user,
+            recipe=cls.recipes[0]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def download(self, url_params='', **headers):
+        """Download shopping cart and return response and content."""
+        url = reverse('recipe-download-shopping-cart') + url_params
+        response = self.client.get(
+            url,
+            headers={**self.headers_authorized, **headers}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def test_download_shopping_cart_unauthorized_user(self):
+        """Unauthorized user can not download shopping cart."""
+        url = reverse('recipe-download-shopping-cart')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_download_shopping_cart_text(self):
+        """Shopping cart is plain text by default."""
+        response, content = self.download()
+        self.assertEqual(
+            response.headers.get('Content-Type'),
+            'text/plain; charset=UTF-8'
+        )
+        self.assertEqual(
+            content.decode(),
+            'Картофель 100г\nСоль 1щепотка\n'
+        )
+
+    def test_download_shopping_cart_csv(self):
+        """Shopping cart in csv by format param."""
+        response, content = self.download('?format=csv')
+        self.assertIn('ingredients.csv', response['Content-Disposition'])
+        self.assertEqual(
+            content.decode().splitlines(),
+            [
+                'Ингредиент,Количество,Единицы измерения',
+                'Картофель,100,г',
+                'Соль,1,щепотка',
+            ]
+        )
+
+    def test_download_shopping_cart_pdf(self):
+        """Shopping cart in pdf by Accept header."""
+        response, content = self.download(Accept='application/pdf')
+        self.assertEqual(response.headers['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def get_shopping_list_queries(self):
+        """Download shopping cart, return queries of shopping list."""
+        with CaptureQueriesContext(connection) as context:
+            _, content = self.download()
+        return content, [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_shoppinglistitem' in query['sql']
+        ]
+
+    def test_download_shopping_cart_cached(self):
+        """Second download reads only version of shopping list."""
+        first_content, first_queries = self.get_shopping_list_queries()
+        second_content, second_queries = self.get_shopping_list_queries()
+        self.assertEqual(first_content, second_content)
+        self.assertEqual(len(first_queries), 2)
+        self.assertEqual(second_queries, first_queries[:1])
+
+    def test_download_shopping_cart_cached_after_other_recipe(self):
+        """Recipes out of cart do not change cached file."""
+        self.download()
+        models.Recipe.objects.create(
+            author=self.user,
+            name='Пюре',
+            image='image.jpeg',
+            text='Разомните картофель.',
+            cooking_time=20
+        ).ingredients.add(self.potato, through_defaults={'amount': 300})
+        _, queries = self.get_shopping_list_queries()
+        self.assertEqual(len(queries), 1)
+
+    def test_download_shopping_cart_after_cart_changed(self):
+        """Downloaded file is changed after recipe added to cart."""
+        self.download()
+        url = reverse(
+            'recipe-manage-shopping-cart',
+            kwargs={'pk': self.recipes[1].id}
+        )
+        self.client.post(url, headers=self.headers_authorized)
+        _, content = self.download()
+        self.assertEqual(
+            content.decode(),
+            'Картофель 300г\nСоль 2щепотка\n'
+        )
+
+    def test_download_shopping_cart_after_ingredient_renamed(self):
+        """Downloaded file is changed after ingredient renamed."""
+        self.download()
+        salt = models.Ingredient.objects.get(id=self.salt.id)
+        salt.name = 'Соль морская'
+        salt.save()
+        _, content = self.download()
+        self.assertEqual(
+            content.decode(),
+            'Картофель 100г\nСоль морская 1щепотка\n'
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ShoppingListAPITestCase(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            email='user@mail.ru',
+            username='user',
+        )
+        token_user = Token.objects.create(user=cls.user).key
+        cls.headers_authorized = {
+            'Authorization': f"Token {token_user}"
+        }
+        cls.tag = models.Tag.objects.create(
+            name='Обед',
+            color='#ffffff',
+            slug='diner'
+        )
+        cls.potato = models.Ingredient.objects.create(
+            name='Картофель',
+            measurement_unit='г'
+        )
+        cls.salt = models.Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='щепотка'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.recipes = []
+        for potato_amount in [100, 200]:
+            recipe = models.Recipe.objects.create(
+                author=self.user,
+                name='Картофель отварной',
+                image='image.jpeg',
+                text='Отварите картофель.',
+                cooking_time=20
+            )
+            models.RecipeIngredient.objects.bulk_create([
+                models.RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=self.potato,
+                    amount=potato_amount
+                ),
+                models.RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=self.salt,
+                    amount=1
+                ),
+            ])
+            recipe.tags.set([self.tag])
+            self.recipes.append(recipe)
+
+    def get_shopping_list(self):
+        """Totals of ingredients in shopping list of user."""
+        return dict(
+            models.ShoppingListItem.objects.filter(
+                user=self.user
+            ).values_list('ingredient__name', 'total')
+        )
+
+    def manage_shopping_cart(self, recipe, method):
+        url = reverse('recipe-manage-shopping-cart', kwargs={'pk': recipe.id})
+        return getattr(self.client, method)(
+            url,
+            headers=self.headers_authorized
+        )
+
+    def test_shopping_list_after_recipes_added_and_removed(self):
+        """Ingredients of recipes are added to and removed from list."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 100, 'Соль': 1}
+        )
+        self.manage_shopping_cart(self.recipes[1], 'post')
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 300, 'Соль': 2}
+        )
+        self.manage_shopping_cart(self.recipes[0], 'delete')
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 200, 'Соль': 1}
+        )
+        self.manage_shopping_cart(self.recipes[1], 'delete')
+        self.assertEqual(self.get_shopping_list(), {})
+
+    def test_shopping_list_after_repeated_requests(self):
+        """Repeated adding and removing do not change list twice."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        response = self.manage_shopping_cart(self.recipes[0], 'post')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 100, 'Соль': 1}
+        )
+        self.manage_shopping_cart(self.recipes[1], 'post')
+        self.manage_shopping_cart(self.recipes[0], 'delete')
+        response = self.manage_shopping_cart(self.recipes[0], 'delete')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 200, 'Соль': 1}
+        )
+
+    def test_shopping_list_after_batch_of_recipes(self):
+        """Ingredients of recipes added and removed by list are counted."""
+        url = reverse('recipe-manage-shopping-cart-batch')
+        ids = [recipe.id for recipe in self.recipes]
+        response = self.client.post(
+            url,
+            data={'ids': ids},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [status.HTTP_201_CREATED, status.HTTP_201_CREATED]
+        )
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 300, 'Соль': 2}
+        )
+        response = self.client.delete(
+            url,
+            data={'ids': ids[:1]},
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 200, 'Соль': 1}
+        )
+        response = self.client.get(
+            reverse('recipe-list'),
+            {'is_in_shopping_cart': 1},
+            headers=self.headers_authorized
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            ids[1:]
+        )
+
+    def test_shopping_list_after_recipe_in_cart_updated(self):
+        """Shopping list is changed after ingredients of recipe changed."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        self.manage_shopping_cart(self.recipes[1], 'post')
+        url = reverse('recipe-detail', kwargs={'pk': self.recipes[0].id})
+        response = self.client.patch(
+            url,
+            data={
+                'name': 'Картофель отварной',
+                'text': 'Отварите картофель.',
+                'cooking_time': 20,
+                'ingredients': [{'id': self.potato.id, 'amount': 50}],
+                'tags': [self.tag.id],
+            },
+            format='json',
+            headers=self.headers_authorized
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 250, 'Соль': 1}
+        )
+
+    def test_shopping_list_after_concurrent_recipe_update(self):
+        """Change of recipe is counted from rows read under lock."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        self.manage_shopping_cart(self.recipes[1], 'post')
+        get_object = RecipeViewSet.get_object
+
+        def get_object_and_update_concurrently(view):
+            recipe = get_object(view)
+            list(recipe.recipe_ingredients.all())
+            models.RecipeIngredient.objects.filter(
+                recipe=recipe,
+                ingredient=self.potato
+            ).update(amount=70)
+            change_shopping_lists(recipe.id, {self.potato.id: -30})
+            return recipe
+
+        url = reverse('recipe-detail', kwargs={'pk': self.recipes[0].id})
+        with mock.patch.object(
+                RecipeViewSet, 'get_object',
+                get_object_and_update_concurrently):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.patch(
+                    url,
+                    data={
+                        'name': 'Картофель отварной',
+                        'text': 'Отварите картофель.',
+                        'cooking_time': 20,
+                        'ingredients': [
+                            {'id': self.potato.id, 'amount': 50},
+                            {'id': self.salt.id, 'amount': 1},
+                        ],
+                        'tags': [self.tag.id],
+                    },
+                    format='json',
+                    headers=self.headers_authorized
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any(
+            'FOR UPDATE' in query['sql']
+            for query in context.captured_queries
+        ))
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 250, 'Соль': 2}
+        )
+
+    def test_shopping_list_after_recipe_in_cart_deleted(self):
+        """Ingredients of deleted recipe are removed from shopping list."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        self.manage_shopping_cart(self.recipes[1], 'post')
+        self.recipes[1].delete()
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 100, 'Соль': 1}
+        )
+
+    def test_download_shopping_cart_reads_shopping_list(self):
+        """Download does not aggregate ingredients of recipes."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        url = reverse('recipe-download-shopping-cart')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, headers=self.headers_authorized)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.decode(), 'Картофель 100г\nСоль 1щепотка\n')
+        for query in context.captured_queries:
+            self.assertNotIn('SUM', query['sql'])
+
+    def test_rebuild_shopping_lists(self):
+        """Shopping lists are recalculated from shopping carts."""
+        self.manage_shopping_cart(self.recipes[0], 'post')
+        models.ShoppingListItem.objects.all().update(total=1)
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertEqual(
+            self.get_shopping_list(),
+            {'Картофель': 100, 'Соль': 1}
+        )
+        self.assertEqual(rebuild_shopping_lists(self.user.id), 2)
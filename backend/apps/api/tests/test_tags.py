@@ -1,4 +1,7 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -58,3 +61,35 @@ class TagsApiTestCase(APITestCase):
         url = reverse('tag-detail', kwargs={'pk': 12})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_tag_list_not_modified(self):
+        """Get not modified tags list by ETag."""
+        url = reverse('tag-list')
+        response = self.client.get(url)
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+        self.assertIn('max-age', response.headers.get('Cache-Control'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        models.Tag.objects.create(
+            name='new_tag',
+            color='#ffffff',
+            slug='new_tag'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+    @mock.patch('apps.recipes.versions.CATALOG_VERSION_TIMEOUT', 0)
+    def test_filter_by_tag_added_by_other_process(self):
+        """Tag inserted without signals is seen by filter of recipes."""
+        url = reverse('recipe-list') + '?tags=breakfast'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {models.Tag._meta.db_table} (name, color, slug) '
+                "VALUES ('Обед', '#ffffff', 'lunch')"
+            )
+        url = reverse('recipe-list') + '?tags=lunch'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -39,6 +40,9 @@ class UserApiTestCase(APITestCase):
             follower=cls.user
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_user_list(self):
         """Get users list. Permissions - Any."""
         url = reverse('user-list')
@@ -159,6 +163,9 @@ class UserPaginatorApiTestCase(APITestCase):
         ]
         cls.users = User.objects.bulk_create(users_list)
 
+    def setUp(self):
+        cache.clear()
+
     def test_get_user_list_pagination(self):
         """Check pagination in user list."""
         limit = 6
@@ -1,73 +1,174 @@
-from typing import Callable, Dict, Union
+from typing import Callable, Dict, List, Union
 
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Model, OuterRef, Prefetch, Subquery
+from django.db import connection, transaction
+from django.db.models import (Exists, F, Model, OuterRef, Prefetch, Value,
+                              Window)
 from django.db.models.base import ModelBase
-from django.http import HttpResponse
+from django.db.models.functions import Coalesce, RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.functional import SimpleLazyObject
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
 from ..recipes import models
+from ..recipes.paginators import clear_counts
+from ..recipes.shopping_list import (add_recipes_to_shopping_list,
+                                     get_totals_difference,
+                                     remove_recipes_from_shopping_list)
+from . import cache
 
 User = get_user_model()
 
+# Lists what counts change with relation
+RELATION_COUNTED_MODELS = {
+    models.Follow: User,
+    models.Favorite: models.Recipe,
+    models.ShoppingCart: models.Recipe,
+}
+# Called with list of recipe ids and user id when relations are changed
+# by SQL, as signals of models are not sent then
+RELATION_HOOKS = {
+    models.ShoppingCart: (
+        add_recipes_to_shopping_list,
+        remove_recipes_from_shopping_list
+    ),
+}
+
+
+def _get_lazy_relation_ids(relation_model, user):
+    """Get id of related objects on first use."""
+    return SimpleLazyObject(
+        lambda: cache.get_relation_ids(relation_model, user)
+    )
+
 
 def add_follows_to_context(context, user):
-    """Add follows of user to context."""
-    result = set()
-    if user.is_authenticated:
-        follows = user.follows.all()
-        for author in follows:
-            result.add(author.author)
-    context['follows'] = result
+    """Add id of authors followed by user to context."""
+    context['follows'] = _get_lazy_relation_ids(models.Follow, user)
 
 
 def add_shipping_cart_to_context(context, user):
-    """Add shopping cart of user to context."""
-    result = set()
-    if user.is_authenticated:
-        shoppings = user.shoppings.all()
-        for shipping_cart in shoppings:
-            result.add(shipping_cart.recipe)
-    context['shoppings'] = result
+    """Add id of recipes in shopping cart of user to context."""
+    context['shoppings'] = _get_lazy_relation_ids(models.ShoppingCart, user)
 
 
 def add_favorites_to_context(context, user):
-    """Add favorites of user to context."""
-    result = set()
-    if user.is_authenticated:
-        favorites = user.favorites.all()
-        for favorite in favorites:
-            result.add(favorite.recipe)
-    context['favorites'] = result
+    """Add id of favorites recipes of user to context."""
+    context['favorites'] = _get_lazy_relation_ids(models.Favorite, user)
 
 
-def create_ingredients(ingredients):
+def create_ingredients(recipe, ingredients):
     """Create ingredients amount objects for recipe."""
     ingredients_objects = (
-        models.IngredientAmount(
-            ingredient=models.Ingredient(id=ingredient.get('id')),
+        models.RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredient.get('id'),
             amount=ingredient.get('amount')
         ) for ingredient in ingredients
     )
-    return models.IngredientAmount.objects.bulk_create(ingredients_objects)
+    return models.RecipeIngredient.objects.bulk_create(ingredients_objects)
+
+
+def update_ingredients(recipe, ingredients) -> Dict[int, int]:
+    """
+    Change ingredients of recipe to submitted ones.
+
+    Only changed rows are deleted, updated or created.
+    Current rows are read again, not from prefetched ones, so recipe
+    should be locked by caller.
+    Return change of amount for each ingredient.
+    """
+    current = {
+        recipe_ingredient.ingredient_id: recipe_ingredient
+        for recipe_ingredient in models.RecipeIngredient.objects.filter(
+            recipe=recipe
+        )
+    }
+    submitted = {
+        ingredient.get('id'): ingredient.get('amount')
+        for ingredient in ingredients
+    }
+    old_totals = {
+        ingredient_id: recipe_ingredient.amount
+        for ingredient_id, recipe_ingredient in current.items()
+    }
+    deleted = current.keys() - submitted.keys()
+    if deleted:
+        models.RecipeIngredient.objects.filter(
+            recipe=recipe,
+            ingredient_id__in=deleted
+        ).delete()
+    changed = []
+    for ingredient_id, amount in submitted.items():
+        recipe_ingredient = current.get(ingredient_id)
+        if recipe_ingredient and recipe_ingredient.amount != amount:
+            recipe_ingredient.amount = amount
+            changed.append(recipe_ingredient)
+    if changed:
+        models.RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    created = [
+        {'id': ingredient_id, 'amount': amount}
+        for ingredient_id, amount in submitted.items()
+        if ingredient_id not in current
+    ]
+    if created:
+        create_ingredients(recipe, created)
+    return get_totals_difference(old_totals, submitted)
+
+
+def get_query_with_recipe_relations(query):
+    """Load author, tags and ingredients of recipes in fixed queries."""
+    return query.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=models.RecipeIngredient.objects.select_related(
+                'ingredient'
+            )
+        ),
+    )
+
+
+def get_query_with_favorites_and_shopping_cart(query, user):
+    """Annotate recipes with is_favorited and is_in_shopping_cart flags."""
+    if not user.is_authenticated:
+        return query.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+        )
+    return query.annotate(
+        is_favorited=Exists(models.Favorite.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+        is_in_shopping_cart=Exists(models.ShoppingCart.objects.filter(
+            user=user, recipe=OuterRef('pk'))),
+    )
 
 
 def get_query_with_recipes_and_recipes_limit(query, recipe_limit):
-    """Add field recipes count and limit of recipes."""
+    """
+    Add field recipes count and limit of recipes.
+
+    Last recipes of each author on page are numbered by ROW_NUMBER
+    and loaded in one query, recipes count is read from counters.
+    """
+    recipes = models.Recipe.objects.only(
+        'id', 'author_id', 'name', 'image', 'image_variants', 'cooking_time'
+    ).order_by('-id')
     if recipe_limit and recipe_limit.isnumeric():
-        recipe_limit = int(recipe_limit)
-    else:
-        recipe_limit = None
-    subquery = Subquery(
-        models.Recipe.objects.filter(
-            author_id=OuterRef('author_id')
-        ).values_list('id', flat=True)[:recipe_limit]
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('id').desc()
+            )
+        ).filter(row_number__lte=int(recipe_limit))
+    return query.prefetch_related(
+        Prefetch('recipes', queryset=recipes)
+    ).annotate(
+        recipes_count=Coalesce(F('counters__recipes_count'), 0)
     )
-    return query.prefetch_related(Prefetch(
-        'recipes', queryset=models.Recipe.objects.filter(id__in=subquery))
-    ).annotate(recipes_count=Count("recipes"))
 
 
 def get_query_with_subscriptions(user, recipe_limit):
@@ -76,32 +177,129 @@ def get_query_with_subscriptions(user, recipe_limit):
     return get_query_with_recipes_and_recipes_limit(query, recipe_limit)
 
 
-def _prepare_ingredients_to_print(ingredients):
-    """Prepare ingredients to print."""
-    data = []
-    for ingredient in ingredients:
-        name = ingredient.get('name')
-        units = ingredient.get('measurement_unit')
-        total = ingredient.get('total')
-        row = f'{name} {total}{units}\n'
-        data.append(row)
-    return ''.join(data)
-
-
-def get_response_with_attachment(ingredients):
-    """Prepare response with attachment."""
-    ingredients = _prepare_ingredients_to_print(ingredients)
-    response = HttpResponse(
-        ingredients,
-        content_type='text/plain; charset=UTF-8',
-        status=status.HTTP_200_OK
-    )
+def _stream_and_cache(chunks, key):
+    """Yield chunks of file and cache whole file after last chunk."""
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set_shopping_cart_file(key, b''.join(content))
+
+
+def get_response_with_attachment(ingredients, renderer, user):
+    """Prepare response with attachment streamed from query."""
+    key = cache.get_shopping_cart_file_key(user, renderer.format)
+    content = cache.get_shopping_cart_file(key)
+    if content is not None:
+        response = HttpResponse(content, status=status.HTTP_200_OK)
+    else:
+        response = StreamingHttpResponse(
+            _stream_and_cache(
+                renderer.stream(ingredients.iterator()),
+                key
+            ),
+            status=status.HTTP_200_OK
+        )
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f'; charset={renderer.charset.upper()}'
+    response['Content-Type'] = content_type
     response['Content-Disposition'] = (
-        'attachment; filename=ingredients.txt'
+        f'attachment; filename=ingredients.{renderer.format}'
     )
     return response
 
 
+def _get_relation_row(relation_model: ModelBase, data: Dict):
+    """Columns and values of relation row from related objects."""
+    columns = [
+        relation_model._meta.get_field(field).column for field in data
+    ]
+    values = [getattr(value, 'pk', value) for value in data.values()]
+    return columns, values
+
+
+def insert_relation(relation_model: ModelBase, data: Dict) -> bool:
+    """Insert relation by one statement, return False if it exists."""
+    columns, values = _get_relation_row(relation_model, data)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {relation_model._meta.db_table} '
+            f'({", ".join(columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(values))}) '
+            f'ON CONFLICT DO NOTHING RETURNING 1',
+            values
+        )
+        return cursor.fetchone() is not None
+
+
+def delete_relation(relation_model: ModelBase, data: Dict) -> bool:
+    """Delete relation by one statement, return False if it is absent."""
+    columns, values = _get_relation_row(relation_model, data)
+    condition = ' AND '.join(f'{column} = %s' for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {relation_model._meta.db_table} '
+            f'WHERE {condition} RETURNING 1',
+            values
+        )
+        return cursor.fetchone() is not None
+
+
+def change_relations(
+        method: str,
+        relation_model: ModelBase,
+        user,
+        ids: List[int]) -> Dict[int, bool]:
+    """
+    Insert or delete relations of user with objects by one statement.
+
+    Return for each existing object if its relation was changed,
+    not existing objects are absent in result.
+    """
+    user_field, related_field = cache.RELATION_FIELDS[relation_model]
+    user_column = relation_model._meta.get_field(user_field).column
+    related = relation_model._meta.get_field(related_field)
+    params = [list(ids)]
+    exclude_user = ''
+    if related.related_model is User:
+        exclude_user = 'WHERE target.id <> %s'
+        params.append(user.id)
+    if method == 'POST':
+        change = (
+            f'INSERT INTO {relation_model._meta.db_table} '
+            f'({user_column}, {related.column}) '
+            f'SELECT %s, id FROM found ON CONFLICT DO NOTHING '
+            f'RETURNING {related.column} AS id'
+        )
+    else:
+        change = (
+            f'DELETE FROM {relation_model._meta.db_table} '
+            f'WHERE {user_column} = %s '
+            f'AND {related.column} IN (SELECT id FROM found) '
+            f'RETURNING {related.column} AS id'
+        )
+    params.append(user.id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH found AS (SELECT target.id '
+            f'FROM {related.related_model._meta.db_table} AS target '
+            f'JOIN unnest(%s::bigint[]) AS requested (id) '
+            f'ON requested.id = target.id {exclude_user}), '
+            f'changed AS ({change}) '
+            f'SELECT found.id, changed.id IS NOT NULL '
+            f'FROM found LEFT JOIN changed ON changed.id = found.id',
+            params
+        )
+        return dict(cursor.fetchall())
+
+
+def _clear_relation_caches(relation_model: ModelBase, user) -> None:
+    """Drop cached relations of user and counts of changed lists."""
+    cache.clear_relation_ids(relation_model, user)
+    clear_counts(RELATION_COUNTED_MODELS[relation_model])
+
+
 def get_response_for_create_or_delete(
         method: str,
         obj: Model,
@@ -109,23 +307,78 @@ def get_response_for_create_or_delete(
         action: str,
         data: Dict,
         serializer_class: Union[Callable, Serializer]) -> Response:
-    """Return response after create or delete relation."""
-    relation = relation_model.objects.filter(**data)
+    """
+    Return response after create or delete relation.
+
+    Relation is created or deleted by one statement, so repeated
+    requests get 400 response instead of error of unique constraint.
+    """
+    user_field, _ = cache.RELATION_FIELDS[relation_model]
+    user = data[user_field]
+    on_create, on_delete = RELATION_HOOKS.get(relation_model, (None, None))
     if method == 'POST':
-        if relation.exists():
+        with transaction.atomic():
+            created = insert_relation(relation_model, data)
+            if created and on_create:
+                on_create([obj.id], user.id)
+        if not created:
             errors = f'{obj} already in {action}.'
             return Response(errors, status=status.HTTP_400_BAD_REQUEST)
-        relation_model.objects.create(**data)
+        _clear_relation_caches(relation_model, user)
         serializer = serializer_class(obj)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     if method == 'DELETE':
-        if not relation.exists():
+        with transaction.atomic():
+            deleted = delete_relation(relation_model, data)
+            if deleted and on_delete:
+                on_delete([obj.id], user.id)
+        if not deleted:
             errors = f'{obj} not in {action}.'
             return Response(errors, status=status.HTTP_400_BAD_REQUEST)
-        relation.delete()
+        _clear_relation_caches(relation_model, user)
         return Response(status=status.HTTP_204_NO_CONTENT)
     return Response(
         'Unsupported method',
         status=status.HTTP_405_METHOD_NOT_ALLOWED
     )
+
+
+def get_response_for_batch_create_or_delete(
+        method: str,
+        relation_model: ModelBase,
+        user,
+        ids: List[int]) -> Response:
+    """
+    Return status for each id after create or delete relations.
+
+    Statuses are same as for one relation: 201 or 204 when relation is
+    changed, 400 when it is already created or deleted, 404 when object
+    does not exist. All relations are changed in one transaction.
+    """
+    ids = list(dict.fromkeys(ids))
+    on_create, on_delete = RELATION_HOOKS.get(relation_model, (None, None))
+    with transaction.atomic():
+        changed = change_relations(method, relation_model, user, ids)
+        changed_ids = [obj_id for obj_id, done in changed.items() if done]
+        hook = on_create if method == 'POST' else on_delete
+        if changed_ids and hook:
+            hook(changed_ids, user.id)
+    if changed_ids:
+        _clear_relation_caches(relation_model, user)
+    done_status = (
+        status.HTTP_201_CREATED if method == 'POST'
+        else status.HTTP_204_NO_CONTENT
+    )
+    results = []
+    for obj_id in ids:
+        if obj_id == user.id and relation_model is models.Follow:
+            result_status = status.HTTP_400_BAD_REQUEST
+        elif obj_id not in changed:
+            result_status = status.HTTP_404_NOT_FOUND
+        elif changed[obj_id]:
+            result_status = done_status
+        else:
+            result_status = status.HTTP_400_BAD_REQUEST
+        results.append({'id': obj_id, 'status': result_status})
+    return Response({'results': results}, status=status.HTTP_200_OK)
@@ -1,23 +1,26 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from django.db.models import Sum
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, mixins, status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from ..recipes import models
-from . import serializers, utils
+from . import renderers, serializers, utils
 from .filters import RecipeFilterSet
+from .mixins import BatchRelationsMixin, CatalogCacheMixin
 from .paginators import PageLimitPaginator
 from .permissions import AuthorOrReadOnly
+from .search import ingredient_index
 
 User = get_user_model()
 
 
 class UserViewSet(
+        BatchRelationsMixin,
         mixins.CreateModelMixin,
         mixins.ListModelMixin,
         mixins.RetrieveModelMixin,
@@ -118,8 +121,19 @@ class UserViewSet(
             serializer_class=self.get_serializer
         )
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='subscribe',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request):
+        """Subscribe to or unsubscribe from users by list of id."""
+        return self.get_batch_response(request, models.Follow)
+
 
 class TagsViewSet(
+        CatalogCacheMixin,
         mixins.ListModelMixin,
         mixins.RetrieveModelMixin,
         viewsets.GenericViewSet):
@@ -131,6 +145,7 @@ class TagsViewSet(
 
 
 class IngredientViewSet(
+        CatalogCacheMixin,
         mixins.ListModelMixin,
         mixins.RetrieveModelMixin,
         viewsets.GenericViewSet):
@@ -138,12 +153,21 @@ class IngredientViewSet(
     queryset = models.Ingredient.objects.all()
     permission_classes = []
     serializer_class = serializers.IngredientSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name']
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.search_ingredients, request, *args, **kwargs)
+
+    def search_ingredients(self, request, *args, **kwargs):
+        """Ingredients from in memory index, searched by name."""
+        text = request.query_params.get('search')
+        if text:
+            return Response(ingredient_index.search(text))
+        return Response(ingredient_index.all())
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(BatchRelationsMixin, viewsets.ModelViewSet):
     """ViewSet for recipes."""
     queryset = models.Recipe.objects.all()
     permission_classes = [AuthorOrReadOnly]
@@ -152,6 +176,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve', 'update', 'partial_update']:
+            query = utils.get_query_with_recipe_relations(self.queryset)
+            return utils.get_query_with_favorites_and_shopping_cart(
+                query,
+                self.request.user
+            )
+        return self.queryset
+
     def get_serializer_context(self):
         """Extra context provided to the serializer class."""
         context = super().get_serializer_context()
@@ -177,17 +210,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer_class=serializers.ShortRecipeSerializer
         )
 
-    @action(methods=['get'], detail=False, url_path='download_shopping_cart')
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    def manage_favorites_batch(self, request):
+        """Add or remove recipes to favorite by list of id."""
+        return self.get_batch_response(request, models.Favorite)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='download_shopping_cart',
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            renderers.ShoppingCartTextRenderer,
+            renderers.ShoppingCartCSVRenderer,
+            renderers.ShoppingCartPDFRenderer,
+        ]
+    )
     def download_shopping_cart(self, request):
-        """Download list of ingredients from shopping cart."""
+        """
+        Download list of ingredients from shopping cart.
+
+        Format of file is chosen by Accept header or format param:
+        txt, csv, pdf.
+        """
         user = self.request.user
-        ingredients = models.Ingredient.objects.filter(
-            amounts__in_recipes__in_cart__user=user
+        ingredients = models.ShoppingListItem.objects.filter(
+            user=user
         ).values(
-            'name',
-            'measurement_unit',
-        ).annotate(total=Sum('amounts__amount')).order_by('-total')
-        return utils.get_response_with_attachment(ingredients)
+            'total',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('-total')
+        return utils.get_response_with_attachment(
+            ingredients,
+            request.accepted_renderer,
+            user
+        )
 
     @action(methods=['post', 'delete'], detail=True, url_path='shopping_cart')
     def manage_shopping_cart(self, request, pk):
@@ -204,3 +267,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
             },
             serializer_class=serializers.ShortRecipeSerializer
         )
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def manage_shopping_cart_batch(self, request):
+        """Add or delete recipes in shopping cart by list of id."""
+        return self.get_batch_response(request, models.ShoppingCart)
@@ -2,19 +2,18 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from . import models
+from .paginators import CountPaginator
+from .shopping_list import (change_shopping_lists, get_recipes_totals,
+                            get_totals_difference)
 
 
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     """Admin for Ingredients model."""
     list_display = ('id', 'name', 'measurement_unit')
-    list_filter = ('name',)
-
-
-@admin.register(models.IngredientAmount)
-class IngredientAmountAdmin(admin.ModelAdmin):
-    """Admin for IngredientAmount model."""
-    list_display = ('id', 'ingredient', 'amount')
+    list_filter = ('measurement_unit',)
+    search_fields = ('name',)
+    ordering = ('name',)
 
 
 @admin.register(models.Tag)
@@ -33,9 +32,10 @@ class TagInline(admin.StackedInline):
     verbose_name_plural = 'Теги'
 
 
-class IngredientAmountInline(admin.StackedInline):
+class RecipeIngredientInline(admin.StackedInline):
     """Inline for ingredient amount."""
-    model = models.Recipe.ingredients.through
+    model = models.RecipeIngredient
+    autocomplete_fields = ('ingredient',)
     extra = 1
     min_num = 1
     verbose_name = 'Количество ингредиентов'
@@ -46,13 +46,28 @@ class IngredientAmountInline(admin.StackedInline):
 class RecipeAdmin(admin.ModelAdmin):
     """Admin for Recipe model."""
     inlines = [
-        IngredientAmountInline,
+        RecipeIngredientInline,
         TagInline
     ]
-    list_display = ('id', 'name', 'author')
-    list_filter = ('author', 'name', 'tags')
+    list_display = ('id', 'name', 'author', 'favorites_count')
+    list_select_related = ('author',)
+    list_filter = ('tags',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
     readonly_fields = ('in_favorites_count',)
     exclude = ('ingredients', 'tags',)
+    paginator = CountPaginator
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        """Change shopping lists of users by changed ingredients."""
+        recipe_id = form.instance.id
+        old_totals = get_recipes_totals([recipe_id])
+        super().save_related(request, form, formsets, change)
+        change_shopping_lists(
+            recipe_id,
+            get_totals_difference(old_totals, get_recipes_totals([recipe_id]))
+        )
 
     def in_favorites_count(self, obj):
         html_text = (
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from . import models
+
+User = get_user_model()
+
+COUNTERS_TABLE = models.AuthorCounters._meta.db_table
+RECIPE_TABLE = models.Recipe._meta.db_table
+FAVORITE_TABLE = models.Favorite._meta.db_table
+FOLLOW_TABLE = models.Follow._meta.db_table
+
+
+def rebuild_favorites_counts() -> int:
+    """Count favorites of every recipe again, return count of fixed."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {RECIPE_TABLE} AS recipe '
+            f'SET favorites_count = COALESCE(favorite.count, 0) '
+            f'FROM {RECIPE_TABLE} AS counted '
+            f'LEFT JOIN (SELECT recipe_id, COUNT(*) AS count '
+            f'FROM {FAVORITE_TABLE} GROUP BY recipe_id) AS favorite '
+            f'ON favorite.recipe_id = counted.id '
+            f'WHERE recipe.id = counted.id '
+            f'AND recipe.favorites_count <> COALESCE(favorite.count, 0)'
+        )
+        return cursor.rowcount
+
+
+def rebuild_author_counters() -> int:
+    """Count recipes and followers of every user again, return fixed."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {COUNTERS_TABLE} AS counters '
+            f'(user_id, recipes_count, followers_count) '
+            f'SELECT author.id, COALESCE(recipe.count, 0), '
+            f'COALESCE(follow.count, 0) '
+            f'FROM {User._meta.db_table} AS author '
+            f'LEFT JOIN (SELECT author_id, COUNT(*) AS count '
+            f'FROM {RECIPE_TABLE} GROUP BY author_id) AS recipe '
+            f'ON recipe.author_id = author.id '
+            f'LEFT JOIN (SELECT author_id, COUNT(*) AS count '
+            f'FROM {FOLLOW_TABLE} GROUP BY author_id) AS follow '
+            f'ON follow.author_id = author.id '
+            f'LEFT JOIN {COUNTERS_TABLE} AS existing '
+            f'ON existing.user_id = author.id '
+            f'WHERE recipe.count IS NOT NULL OR follow.count IS NOT NULL '
+            f'OR existing.user_id IS NOT NULL '
+            f'ON CONFLICT (user_id) DO UPDATE '
+            f'SET recipes_count = EXCLUDED.recipes_count, '
+            f'followers_count = EXCLUDED.followers_count '
+            f'WHERE counters.recipes_count <> EXCLUDED.recipes_count '
+            f'OR counters.followers_count <> EXCLUDED.followers_count'
+        )
+        return cursor.rowcount
@@ -0,0 +1,134 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from threading import Lock
+from typing import Dict
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {'thumbnail': 160, 'card': 480, 'full': 1280}
+IMAGE_VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+IMAGE_VARIANTS_DIR = 'recipes/variants'
+IMAGE_VARIANT_QUALITY = 80
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _init_worker():
+    """Prepare django in worker process."""
+    django.setup()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Get process pool for image variants, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANTS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+    return _executor
+
+
+def _drop_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop broken process pool, new one is started on next use."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Image in RGB with transparent parts on white background."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def make_image_variants(image_name: str) -> Dict[str, Dict[str, str]]:
+    """Save resized copies of image, return their names in storage."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = {}
+    with default_storage.open(image_name) as file:
+        with Image.open(file) as original:
+            image = _to_rgb(original)
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size))
+        variants[variant] = {}
+        for extension, image_format in IMAGE_VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=IMAGE_VARIANT_QUALITY
+            )
+            variants[variant][extension] = default_storage.save(
+                f'{IMAGE_VARIANTS_DIR}/{stem}_{variant}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def update_image_variants(recipe_id: int, image_name: str) -> None:
+    """Make variants of recipe image if image was not changed since."""
+    variants = make_image_variants(image_name)
+    models.Recipe.objects.filter(
+        id=recipe_id,
+        image=image_name
+    ).update(image_variants=variants)
+
+
+def _log_error(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        logger.error('Image variants are not made: %r', error)
+
+
+def schedule_image_variants(recipe: models.Recipe) -> None:
+    """
+    Make variants of recipe image in process pool after commit.
+
+    Process pool broken by killed worker is replaced by new one, errors
+    of scheduling are logged and do not fail saved request.
+    """
+    recipe_id, image_name = recipe.id, recipe.image.name
+
+    def submit():
+        executor = get_executor()
+        try:
+            future = executor.submit(
+                update_image_variants,
+                recipe_id,
+                image_name
+            )
+        except BrokenProcessPool:
+            _drop_executor(executor)
+            future = get_executor().submit(
+                update_image_variants,
+                recipe_id,
+                image_name
+            )
+        future.add_done_callback(_log_error)
+
+    transaction.on_commit(submit, robust=True)
@@ -1,32 +1,108 @@
 import csv
+import json
+import os
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
 from ... import models
 
+DEFAULT_PATH = 'static/data_csv/ingredients.csv'
+BATCH_SIZE = 1000
+FORMATS = ('csv', 'json')
+
+
+def read_csv(path):
+    """Ingredients from csv rows: name, measurement unit."""
+    with open(path, encoding='utf-8') as csvfile:
+        for row in csv.reader(csvfile):
+            if row:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    """Ingredients from json list of objects."""
+    with open(path, encoding='utf-8') as jsonfile:
+        for ingredient in json.load(jsonfile):
+            yield ingredient['name'], ingredient['measurement_unit']
+
+
+def upsert_ingredients(ingredients):
+    """
+    Insert new ingredients and fix spelling of existing ones.
+
+    Ingredients are matched by name in any case and measurement unit.
+    Return count of inserted and updated ingredients.
+    """
+    values = ', '.join(['(%s, %s)'] * len(ingredients))
+    table = models.Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} AS ingredient (name, measurement_unit) '
+            f'VALUES {values} '
+            'ON CONFLICT (LOWER(name), measurement_unit) '
+            'DO UPDATE SET name = EXCLUDED.name '
+            'WHERE ingredient.name <> EXCLUDED.name '
+            'RETURNING xmax = 0',
+            [value for ingredient in ingredients for value in ingredient]
+        )
+        inserted = [row[0] for row in cursor.fetchall()]
+    return inserted.count(True), inserted.count(False)
+
 
 class Command(BaseCommand):
-    help = "Import ingredients in db."
+    help = (
+        "Add ingredients from csv or json file to db. "
+        "Existing ingredients and recipes are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Format of file, by extension of file by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
 
     def handle(self, *args, **options):
-        path = 'static/data_csv/ingredients.csv'
-
-        ingredients = models.Ingredient.objects.all()
-        ingredients.delete()
-        objects = []
-        with open(path, encoding='utf-8') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                object = models.Ingredient(
-                    name=row[0],
-                    measurement_unit=row[1]
-                )
-                objects.append(object)
-
-            created_objects = models.Ingredient.objects.bulk_create(objects)
-            created_count = len(created_objects)
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'(Добавлено ингредиентов: {created_count}'
-                )
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        reader = read_csv if file_format == 'csv' else read_json
+        inserted_count = updated_count = total_count = duplicates_count = 0
+        batch = {}
+        try:
+            for name, measurement_unit in reader(path):
+                name, measurement_unit = name.strip(), measurement_unit.strip()
+                key = (name.lower(), measurement_unit)
+                if key in batch:
+                    duplicates_count += 1
+                batch[key] = (name, measurement_unit)
+                total_count += 1
+                if len(batch) >= options['batch_size']:
+                    inserted, updated = upsert_ingredients(
+                        list(batch.values()))
+                    inserted_count += inserted
+                    updated_count += updated
+                    batch = {}
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            raise CommandError(f'Ошибка чтения {path}: {error!r}')
+        if batch:
+            inserted, updated = upsert_ingredients(list(batch.values()))
+            inserted_count += inserted
+            updated_count += updated
+        unchanged_count = (
+            total_count - inserted_count - updated_count - duplicates_count
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Добавлено ингредиентов: {inserted_count}, '
+                f'обновлено: {updated_count}, '
+                f'без изменений: {unchanged_count}, '
+                f'повторов в файле: {duplicates_count}'
             )
+        )
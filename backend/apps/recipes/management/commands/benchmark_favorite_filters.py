@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ....api.filters import RecipeFilterSet
+from ... import models
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare NOT IN and NOT EXISTS filters is_favorited=0 "
+        "on generated data. Generated data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--favorites', type=int, default=2_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _generate_data(self, users, recipes, favorites):
+        """Insert users, recipes and favorites with generate_series."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {User._meta.db_table} (password, is_superuser, '
+                'username, first_name, last_name, email, is_staff, '
+                'is_active, date_joined) '
+                "SELECT '', false, 'benchmark_' || i, '', '', "
+                "'benchmark_' || i || '@mail.ru', false, true, now() "
+                'FROM generate_series(1, %s) AS i RETURNING id',
+                [users]
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f'INSERT INTO {models.Recipe._meta.db_table} '
+                '(name, author_id, text, image, image_variants, '
+                'cooking_time, favorites_count) '
+                "SELECT 'Рецепт ' || i, %s + i %% %s, 'Рецепт', "
+                "'image.jpeg', '{}', 10, 0 FROM generate_series(1, %s) AS i "
+                'RETURNING id',
+                [min(user_ids), users, recipes]
+            )
+            recipe_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f'INSERT INTO {models.Favorite._meta.db_table} '
+                '(user_id, recipe_id) '
+                'SELECT %s + floor(random() * %s), '
+                '%s + floor(random() * %s) '
+                'FROM generate_series(1, %s) ON CONFLICT DO NOTHING',
+                [min(user_ids), users, min(recipe_ids), recipes, favorites]
+            )
+            for model in [User, models.Recipe, models.Favorite]:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        return User.objects.get(id=min(user_ids))
+
+    def _measure(self, name, queryset, repeat):
+        """Print plan and average time of first page of query."""
+        page = queryset.order_by('-id')[:6]
+        self.stdout.write(f'\n{name}:\n{page.explain(analyze=True)}')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(page.values_list('id', flat=True))
+            queryset.count()
+        duration = (time.perf_counter() - start) / repeat * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {duration:.1f} ms per page with count'
+        ))
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self._generate_data(
+                options['users'],
+                options['recipes'],
+                options['favorites']
+            )
+            recipes = models.Recipe.objects.all()
+            filterset = RecipeFilterSet(
+                queryset=recipes,
+                request=SimpleNamespace(user=user)
+            )
+            self._measure(
+                'NOT IN',
+                recipes.exclude(id__in=models.Favorite.objects.filter(
+                    user=user).values('recipe_id')),
+                options['repeat']
+            )
+            self._measure(
+                'NOT EXISTS',
+                filterset.filter_favorited(recipes, 'is_favorited', False),
+                options['repeat']
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,119 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+
+from ....api.utils import get_query_with_recipes_and_recipes_limit
+from ... import models
+
+User = get_user_model()
+PAGE_SIZE = 6
+
+
+def get_query_with_sliced_subquery(query, recipe_limit):
+    """Recipes limited by correlated subquery, counted over full join."""
+    subquery = Subquery(
+        models.Recipe.objects.filter(
+            author_id=OuterRef('author_id')
+        ).values_list('id', flat=True)[:int(recipe_limit)]
+    )
+    return query.prefetch_related(Prefetch(
+        'recipes', queryset=models.Recipe.objects.filter(id__in=subquery))
+    ).annotate(recipes_count=Count('recipes'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare correlated subquery and ROW_NUMBER for recipes of "
+        "subscriptions on generated data. Generated data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows',
+            type=int,
+            nargs='+',
+            default=[10, 100, 500],
+            help='Counts of authors followed by user.'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Counts of recipes of each author.'
+        )
+        parser.add_argument('--recipes-limit', default='3')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _generate_data(self, follows, recipes):
+        """Insert user following authors with recipes by generate_series."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {User._meta.db_table} (password, is_superuser, '
+                'username, first_name, last_name, email, is_staff, '
+                'is_active, date_joined) '
+                "SELECT '', false, 'benchmark_' || i, '', '', "
+                "'benchmark_' || i || '@mail.ru', false, true, now() "
+                'FROM generate_series(0, %s) AS i RETURNING id',
+                [follows]
+            )
+            user_ids = sorted(row[0] for row in cursor.fetchall())
+            follower_id, author_ids = user_ids[0], user_ids[1:]
+            cursor.execute(
+                f'INSERT INTO {models.Recipe._meta.db_table} '
+                '(name, author_id, text, image, image_variants, '
+                'cooking_time, favorites_count) '
+                "SELECT 'Рецепт ' || i, author_id, 'Рецепт', "
+                "'image.jpeg', '{}', 10, 0 "
+                'FROM unnest(%s) AS author_id, generate_series(1, %s) AS i',
+                [author_ids, recipes]
+            )
+            cursor.execute(
+                f'INSERT INTO {models.Follow._meta.db_table} '
+                '(author_id, follower_id) '
+                'SELECT author_id, %s FROM unnest(%s) AS author_id',
+                [follower_id, author_ids]
+            )
+            for model in [User, models.Recipe, models.Follow]:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        return User.objects.get(id=follower_id)
+
+    def _measure(self, get_query, user, recipe_limit, repeat):
+        """Average time of first page of subscriptions in ms."""
+        subscriptions = User.objects.filter(
+            followers__follower=user
+        ).order_by('-id')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            page = get_query(subscriptions, recipe_limit)[:PAGE_SIZE]
+            for author in page:
+                list(author.recipes.all())
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        recipe_limit = options['recipes_limit']
+        for follows in options['follows']:
+            for recipes in options['recipes']:
+                with transaction.atomic():
+                    user = self._generate_data(follows, recipes)
+                    subquery = self._measure(
+                        get_query_with_sliced_subquery,
+                        user,
+                        recipe_limit,
+                        options['repeat']
+                    )
+                    window = self._measure(
+                        get_query_with_recipes_and_recipes_limit,
+                        user,
+                        recipe_limit,
+                        options['repeat']
+                    )
+                    transaction.set_rollback(True)
+                self.stdout.write(self.style.SUCCESS(
+                    f'follows={follows} recipes={recipes}: '
+                    f'subquery {subquery:.1f} ms, '
+                    f'row_number {window:.1f} ms'
+                ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from ... import models
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete ingredient amounts not used by recipes since ingredients "
+        "of recipes moved to RecipeIngredient."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Count of rows deleted in one query.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        deleted_count = 0
+        while True:
+            batch = list(
+                models.IngredientAmount.objects.order_by(
+                    'id'
+                ).values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            deleted, _ = models.IngredientAmount.objects.filter(
+                id__in=batch
+            ).delete()
+            deleted_count += deleted
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Удалено количеств ингредиентов: {deleted_count}'
+            )
+        )
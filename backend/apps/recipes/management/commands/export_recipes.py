@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from ... import models
+
+CHUNK_SIZE = 2000
+
+
+def get_recipe_line(recipe: models.Recipe) -> str:
+    """Recipe with author, tags and ingredients as line of JSON."""
+    author = recipe.author
+    return json.dumps({
+        'author': {
+            'username': author.username,
+            'email': author.email,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+        },
+        'name': recipe.name,
+        'text': recipe.text,
+        'image': recipe.image.name,
+        'cooking_time': recipe.cooking_time,
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': recipe_ingredient.ingredient.name,
+                'measurement_unit': (
+                    recipe_ingredient.ingredient.measurement_unit
+                ),
+                'amount': recipe_ingredient.amount,
+            } for recipe_ingredient in recipe.recipe_ingredients.all()
+        ],
+    }, ensure_ascii=False)
+
+
+class Command(BaseCommand):
+    help = "Export recipes to JSON Lines file, one recipe on line."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Path of file, standard output by default.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        recipes = models.Recipe.objects.select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=models.RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).order_by('id').defer('search_vector')
+        path = options['path']
+        file = (
+            self.stdout if path == '-'
+            else open(path, 'w', encoding='utf-8')
+        )
+        exported_count = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                file.write(get_recipe_line(recipe) + '\n')
+                exported_count += 1
+        finally:
+            if file is not self.stdout:
+                file.close()
+        self.stderr.write(
+            self.style.SUCCESS(f'Выгружено рецептов: {exported_count}')
+        )
@@ -0,0 +1,240 @@
+import csv
+import json
+import sys
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from ... import models
+from ...paginators import clear_counts
+
+User = get_user_model()
+BATCH_SIZE = 10000
+STAGING_TABLES = {
+    'import_recipe': (
+        'line', 'username', 'email', 'first_name', 'last_name',
+        'name', 'text', 'image', 'cooking_time',
+    ),
+    'import_tag': ('line', 'name', 'color', 'slug'),
+    'import_ingredient': ('line', 'name', 'measurement_unit', 'amount'),
+}
+
+
+def get_rows(line_number: int, recipe: dict):
+    """Rows of staging tables from recipe of one line."""
+    author = recipe['author']
+    yield 'import_recipe', (
+        line_number,
+        author['username'],
+        author.get('email', ''),
+        author.get('first_name', ''),
+        author.get('last_name', ''),
+        recipe['name'],
+        recipe['text'],
+        recipe['image'],
+        recipe['cooking_time'],
+    )
+    for tag in recipe.get('tags', []):
+        yield 'import_tag', (
+            line_number, tag['name'], tag['color'], tag['slug'])
+    for ingredient in recipe['ingredients']:
+        yield 'import_ingredient', (
+            line_number,
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['amount'],
+        )
+
+
+class StagingBuffer:
+    """Rows of staging tables loaded by COPY in batches."""
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.buffers = {table: StringIO() for table in STAGING_TABLES}
+        self.writers = {
+            table: csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+            for table, buffer in self.buffers.items()
+        }
+
+    def write(self, table, row):
+        self.writers[table].writerow(row)
+
+    def flush(self):
+        for table, buffer in self.buffers.items():
+            buffer.seek(0)
+            self.cursor.copy_expert(
+                f'COPY {table} ({", ".join(STAGING_TABLES[table])}) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import recipes from JSON Lines file made by export_recipes. "
+        "Recipes already existing for author with same name are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Path of file, standard input by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Count of lines loaded by one COPY.'
+        )
+
+    def _create_staging_tables(self, cursor):
+        cursor.execute(
+            'CREATE TEMP TABLE import_recipe (line bigint PRIMARY KEY, '
+            'username text, email text, first_name text, last_name text, '
+            'name text, text text, image text, cooking_time integer, '
+            'recipe_id bigint) ON COMMIT DROP'
+        )
+        cursor.execute(
+            'CREATE TEMP TABLE import_tag (line bigint, name text, '
+            'color text, slug text) ON COMMIT DROP'
+        )
+        cursor.execute(
+            'CREATE TEMP TABLE import_ingredient (line bigint, name text, '
+            'measurement_unit text, amount integer) ON COMMIT DROP'
+        )
+
+    def _load(self, cursor, file, batch_size):
+        """Copy lines of file to staging tables, return count of recipes."""
+        staging = StagingBuffer(cursor)
+        recipes_count = 0
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            recipes_count += 1
+            try:
+                for table, row in get_rows(line_number, json.loads(line)):
+                    staging.write(table, row)
+            except (ValueError, KeyError, TypeError) as error:
+                raise CommandError(f'Строка {line_number}: {error!r}')
+            if recipes_count % batch_size == 0:
+                staging.flush()
+        staging.flush()
+        for table in STAGING_TABLES:
+            cursor.execute(f'ANALYZE {table}')
+        return recipes_count
+
+    def _merge(self, cursor):
+        """Insert authors, tags, ingredients and recipes from staging."""
+        recipes = models.Recipe._meta.db_table
+        ingredients = models.Ingredient._meta.db_table
+        cursor.execute(
+            f'INSERT INTO {User._meta.db_table} (password, is_superuser, '
+            'username, first_name, last_name, email, is_staff, is_active, '
+            'date_joined) '
+            "SELECT DISTINCT ON (username) '!', false, username, "
+            "first_name, last_name, email, false, true, now() "
+            'FROM import_recipe ORDER BY username, line '
+            'ON CONFLICT DO NOTHING'
+        )
+        cursor.execute(
+            f'INSERT INTO {models.Tag._meta.db_table} (name, color, slug) '
+            'SELECT DISTINCT ON (slug) name, color, slug '
+            'FROM import_tag ORDER BY slug, line ON CONFLICT DO NOTHING'
+        )
+        cursor.execute(
+            f'INSERT INTO {ingredients} (name, measurement_unit) '
+            'SELECT DISTINCT ON (LOWER(name), measurement_unit) '
+            'name, measurement_unit FROM import_ingredient '
+            'ORDER BY LOWER(name), measurement_unit, line '
+            'ON CONFLICT (LOWER(name), measurement_unit) DO NOTHING'
+        )
+        cursor.execute(
+            'UPDATE import_recipe AS staged '
+            f"SET recipe_id = nextval(pg_get_serial_sequence('{recipes}', "
+            "'id')) "
+            'FROM (SELECT DISTINCT ON (username, name) line '
+            'FROM import_recipe ORDER BY username, name, line) AS first_line '
+            'WHERE staged.line = first_line.line AND NOT EXISTS ('
+            f'SELECT 1 FROM {recipes} AS recipe '
+            f'JOIN {User._meta.db_table} AS author '
+            'ON author.id = recipe.author_id '
+            'WHERE author.username = staged.username '
+            'AND recipe.name = staged.name)'
+        )
+        search_vector = ' || '.join(
+            f"setweight(to_tsvector('{models.SEARCH_CONFIG}'::regconfig, "
+            f"staged.{field}), '{weight}')"
+            for field, weight in models.SEARCH_FIELDS.items()
+        )
+        cursor.execute(
+            f'INSERT INTO {recipes} (id, name, author_id, text, image, '
+            'image_variants, cooking_time, favorites_count, search_vector) '
+            'SELECT staged.recipe_id, staged.name, author.id, staged.text, '
+            "staged.image, '{}', staged.cooking_time, 0, "
+            f'{search_vector} '
+            'FROM import_recipe AS staged '
+            f'JOIN {User._meta.db_table} AS author '
+            'ON author.username = staged.username '
+            'WHERE staged.recipe_id IS NOT NULL'
+        )
+        imported_count = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {models.Recipe.tags.through._meta.db_table} '
+            '(recipe_id, tag_id) '
+            'SELECT DISTINCT staged.recipe_id, tag.id '
+            'FROM import_tag '
+            'JOIN import_recipe AS staged ON staged.line = import_tag.line '
+            f'JOIN {models.Tag._meta.db_table} AS tag '
+            'ON tag.slug = import_tag.slug '
+            'WHERE staged.recipe_id IS NOT NULL ON CONFLICT DO NOTHING'
+        )
+        cursor.execute(
+            f'INSERT INTO {models.RecipeIngredient._meta.db_table} '
+            '(recipe_id, ingredient_id, amount) '
+            'SELECT staged.recipe_id, ingredient.id, '
+            'LEAST(SUM(import_ingredient.amount), '
+            f'{models.MAX_POSITIVE_VALUE}) '
+            'FROM import_ingredient '
+            'JOIN import_recipe AS staged '
+            'ON staged.line = import_ingredient.line '
+            f'JOIN {ingredients} AS ingredient '
+            'ON LOWER(ingredient.name) = LOWER(import_ingredient.name) '
+            'AND ingredient.measurement_unit = '
+            'import_ingredient.measurement_unit '
+            'WHERE staged.recipe_id IS NOT NULL '
+            'GROUP BY staged.recipe_id, ingredient.id'
+        )
+        return imported_count
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8')
+        )
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL gin_pending_list_limit = '64MB'")
+                self._create_staging_tables(cursor)
+                recipes_count = self._load(
+                    cursor, file, options['batch_size'])
+                imported_count = self._merge(cursor)
+        except DatabaseError as error:
+            raise CommandError(str(error))
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        clear_counts(models.Recipe)
+        clear_counts(User)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Загружено рецептов: {imported_count}, '
+                f'пропущено: {recipes_count - imported_count}'
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from ... import models
+from ...images import get_executor, update_image_variants
+
+
+class Command(BaseCommand):
+    help = "Make resized variants of recipe images what have not them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Make variants again for all recipes.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = models.Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        images = recipes.values_list('id', 'image').iterator()
+        made_count = failed_count = 0
+        executor = get_executor()
+        futures = [
+            executor.submit(update_image_variants, recipe_id, image_name)
+            for recipe_id, image_name in images
+        ]
+        for future in futures:
+            if future.exception() is None:
+                made_count += 1
+            else:
+                failed_count += 1
+                self.stderr.write(repr(future.exception()))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Обработано изображений: {made_count}, '
+                f'с ошибками: {failed_count}'
+            )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...counters import rebuild_author_counters, rebuild_favorites_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Count recipes and followers of users and favorites of recipes "
+        "again from scratch."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            favorites_fixed = rebuild_favorites_counts()
+            authors_fixed = rebuild_author_counters()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Исправлено счетчиков рецептов: {favorites_fixed}, '
+                f'авторов: {authors_fixed}'
+            )
+        )
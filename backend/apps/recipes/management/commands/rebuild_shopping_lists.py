@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = "Recalculate shopping lists of users from shopping carts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Id of user.')
+
+    def handle(self, *args, **options):
+        items_count = rebuild_shopping_lists(options['user'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Позиций в списках покупок: {items_count}')
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-17 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_alter_favorite_options_alter_follow_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+                'ON recipes_recipe_tags (tag_id, recipe_id);'
+            ),
+            reverse_sql='DROP INDEX recipes_recipe_tags_tag_recipe_idx;',
+        ),
+    ]
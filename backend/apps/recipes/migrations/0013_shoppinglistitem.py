@@ -0,0 +1,47 @@
+# Generated by Django 4.2.3 on 2026-10-17 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='in_shopping_lists', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Список покупок',
+                'verbose_name_plural': 'Списки покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_in_shopping_list'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO recipes_shoppinglistitem '
+                '(user_id, ingredient_id, total) '
+                'SELECT cart.user_id, amount.ingredient_id, SUM(amount.amount) '
+                'FROM recipes_shoppingcart AS cart '
+                'JOIN recipes_recipe_ingredients AS recipe_ingredient '
+                'ON recipe_ingredient.recipe_id = cart.recipe_id '
+                'JOIN recipes_ingredientamount AS amount '
+                'ON amount.id = recipe_ingredient.ingredientamount_id '
+                'GROUP BY cart.user_id, amount.ingredient_id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.3 on 2026-10-17 07:14
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredientamount',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legacy_amounts', to='recipes.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(32767), django.core.validators.MinValueValidator(1)], verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amounts', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, db_index=False, related_name='recipe_ingredients', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Количество ингредиентов',
+                'verbose_name_plural': 'Количество ингредиентов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO recipes_recipeingredient '
+                '(recipe_id, ingredient_id, amount) '
+                'SELECT recipe_ingredient.recipe_id, amount.ingredient_id, '
+                'LEAST(SUM(amount.amount), 32767) '
+                'FROM recipes_recipe_ingredients AS recipe_ingredient '
+                'JOIN recipes_ingredientamount AS amount '
+                'ON amount.id = recipe_ingredient.ingredientamount_id '
+                'GROUP BY recipe_ingredient.recipe_id, amount.ingredient_id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='ingredients',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(related_name='recipes', through='recipes.RecipeIngredient', to='recipes.ingredient', verbose_name='Ингредиенты'),
+        ),
+    ]
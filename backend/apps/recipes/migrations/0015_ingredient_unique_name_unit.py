@@ -0,0 +1,62 @@
+# Generated by Django 4.2.3 on 2026-10-17 07:26
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'CREATE TEMP TABLE ingredient_duplicate ON COMMIT DROP AS '
+                'SELECT id, MIN(id) OVER ('
+                'PARTITION BY LOWER(name), measurement_unit) AS keep_id '
+                'FROM recipes_ingredient',
+                'DELETE FROM ingredient_duplicate WHERE id = keep_id',
+                'INSERT INTO recipes_recipeingredient '
+                '(recipe_id, ingredient_id, amount) '
+                'SELECT amount.recipe_id, duplicate.keep_id, '
+                'LEAST(SUM(amount.amount), 32767) '
+                'FROM recipes_recipeingredient AS amount '
+                'JOIN ingredient_duplicate AS duplicate '
+                'ON duplicate.id = amount.ingredient_id '
+                'GROUP BY amount.recipe_id, duplicate.keep_id '
+                'ON CONFLICT (recipe_id, ingredient_id) DO UPDATE SET '
+                'amount = LEAST('
+                'recipes_recipeingredient.amount + EXCLUDED.amount, 32767)',
+                'DELETE FROM recipes_recipeingredient AS amount '
+                'USING ingredient_duplicate AS duplicate '
+                'WHERE duplicate.id = amount.ingredient_id',
+                'INSERT INTO recipes_shoppinglistitem '
+                '(user_id, ingredient_id, total) '
+                'SELECT item.user_id, duplicate.keep_id, SUM(item.total) '
+                'FROM recipes_shoppinglistitem AS item '
+                'JOIN ingredient_duplicate AS duplicate '
+                'ON duplicate.id = item.ingredient_id '
+                'GROUP BY item.user_id, duplicate.keep_id '
+                'ON CONFLICT (user_id, ingredient_id) DO UPDATE SET '
+                'total = recipes_shoppinglistitem.total + EXCLUDED.total',
+                'DELETE FROM recipes_shoppinglistitem AS item '
+                'USING ingredient_duplicate AS duplicate '
+                'WHERE duplicate.id = item.ingredient_id',
+                'UPDATE recipes_ingredientamount AS amount '
+                'SET ingredient_id = duplicate.keep_id '
+                'FROM ingredient_duplicate AS duplicate '
+                'WHERE duplicate.id = amount.ingredient_id',
+                'DELETE FROM recipes_ingredient AS ingredient '
+                'USING ingredient_duplicate AS duplicate '
+                'WHERE duplicate.id = ingredient.id',
+                'SET CONSTRAINTS ALL IMMEDIATE',
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), models.F('measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -0,0 +1,186 @@
+# Generated by Django 4.2.3 on 2026-10-17 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+COUNTER_TRIGGERS = """
+CREATE FUNCTION recipes_count_inserted_recipes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO recipes_authorcounters AS counters
+    (user_id, recipes_count, followers_count)
+    SELECT author_id, COUNT(*), 0 FROM new_rows GROUP BY author_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET recipes_count = counters.recipes_count + EXCLUDED.recipes_count;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_deleted_recipes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_authorcounters AS counters
+    SET recipes_count = GREATEST(counters.recipes_count - deleted.count, 0)
+    FROM (SELECT author_id, COUNT(*) AS count FROM old_rows
+          GROUP BY author_id) AS deleted
+    WHERE counters.user_id = deleted.author_id;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_moved_recipe() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_authorcounters
+    SET recipes_count = GREATEST(recipes_count - 1, 0)
+    WHERE user_id = OLD.author_id;
+    INSERT INTO recipes_authorcounters AS counters
+    (user_id, recipes_count, followers_count)
+    VALUES (NEW.author_id, 1, 0)
+    ON CONFLICT (user_id) DO UPDATE
+    SET recipes_count = counters.recipes_count + 1;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_inserted_favorites() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_recipe AS recipe
+    SET favorites_count = recipe.favorites_count + inserted.count
+    FROM (SELECT recipe_id, COUNT(*) AS count FROM new_rows
+          GROUP BY recipe_id) AS inserted
+    WHERE recipe.id = inserted.recipe_id;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_deleted_favorites() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_recipe AS recipe
+    SET favorites_count = GREATEST(recipe.favorites_count - deleted.count, 0)
+    FROM (SELECT recipe_id, COUNT(*) AS count FROM old_rows
+          GROUP BY recipe_id) AS deleted
+    WHERE recipe.id = deleted.recipe_id;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_inserted_follows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO recipes_authorcounters AS counters
+    (user_id, recipes_count, followers_count)
+    SELECT author_id, 0, COUNT(*) FROM new_rows GROUP BY author_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET followers_count = counters.followers_count + EXCLUDED.followers_count;
+    RETURN NULL;
+END $$;
+
+CREATE FUNCTION recipes_count_deleted_follows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_authorcounters AS counters
+    SET followers_count = GREATEST(
+        counters.followers_count - deleted.count, 0)
+    FROM (SELECT author_id, COUNT(*) AS count FROM old_rows
+          GROUP BY author_id) AS deleted
+    WHERE counters.user_id = deleted.author_id;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER recipe_inserted_counters AFTER INSERT ON recipes_recipe
+REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_inserted_recipes();
+
+CREATE TRIGGER recipe_deleted_counters AFTER DELETE ON recipes_recipe
+REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_deleted_recipes();
+
+CREATE TRIGGER recipe_moved_counters
+AFTER UPDATE OF author_id ON recipes_recipe FOR EACH ROW
+WHEN (OLD.author_id IS DISTINCT FROM NEW.author_id)
+EXECUTE FUNCTION recipes_count_moved_recipe();
+
+CREATE TRIGGER favorite_inserted_counters AFTER INSERT ON recipes_favorite
+REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_inserted_favorites();
+
+CREATE TRIGGER favorite_deleted_counters AFTER DELETE ON recipes_favorite
+REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_deleted_favorites();
+
+CREATE TRIGGER follow_inserted_counters AFTER INSERT ON recipes_follow
+REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_inserted_follows();
+
+CREATE TRIGGER follow_deleted_counters AFTER DELETE ON recipes_follow
+REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_count_deleted_follows();
+"""
+
+DROP_COUNTER_TRIGGERS = """
+DROP TRIGGER recipe_inserted_counters ON recipes_recipe;
+DROP TRIGGER recipe_deleted_counters ON recipes_recipe;
+DROP TRIGGER recipe_moved_counters ON recipes_recipe;
+DROP TRIGGER favorite_inserted_counters ON recipes_favorite;
+DROP TRIGGER favorite_deleted_counters ON recipes_favorite;
+DROP TRIGGER follow_inserted_counters ON recipes_follow;
+DROP TRIGGER follow_deleted_counters ON recipes_follow;
+DROP FUNCTION recipes_count_inserted_recipes();
+DROP FUNCTION recipes_count_deleted_recipes();
+DROP FUNCTION recipes_count_moved_recipe();
+DROP FUNCTION recipes_count_inserted_favorites();
+DROP FUNCTION recipes_count_deleted_favorites();
+DROP FUNCTION recipes_count_inserted_follows();
+DROP FUNCTION recipes_count_deleted_follows();
+"""
+
+FILL_COUNTERS = """
+UPDATE recipes_recipe AS recipe SET favorites_count = favorite.count
+FROM (SELECT recipe_id, COUNT(*) AS count FROM recipes_favorite
+      GROUP BY recipe_id) AS favorite
+WHERE recipe.id = favorite.recipe_id;
+
+INSERT INTO recipes_authorcounters (user_id, recipes_count, followers_count)
+SELECT author.id, COALESCE(recipe.count, 0), COALESCE(follow.count, 0)
+FROM auth_user AS author
+LEFT JOIN (SELECT author_id, COUNT(*) AS count FROM recipes_recipe
+           GROUP BY author_id) AS recipe ON recipe.author_id = author.id
+LEFT JOIN (SELECT author_id, COUNT(*) AS count FROM recipes_follow
+           GROUP BY author_id) AS follow ON follow.author_id = author.id
+WHERE recipe.count IS NOT NULL OR follow.count IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0017_recipe_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Количество рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Счетчики автора',
+                'verbose_name_plural': 'Счетчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.RunSQL(
+            sql=COUNTER_TRIGGERS,
+            reverse_sql=DROP_COUNTER_TRIGGERS,
+        ),
+        migrations.RunSQL(
+            sql=FILL_COUNTERS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
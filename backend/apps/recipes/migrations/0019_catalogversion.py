@@ -0,0 +1,69 @@
+# Generated by Django 4.2.3 on 2026-10-17 07:56
+
+from django.db import migrations, models
+
+VERSION_TRIGGERS = """
+CREATE SEQUENCE recipes_catalogversion_seq;
+
+CREATE FUNCTION recipes_change_catalog_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO recipes_catalogversion (model, version)
+    VALUES (TG_ARGV[0], nextval('recipes_catalogversion_seq'))
+    ON CONFLICT (model) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER tag_catalog_version
+AFTER INSERT OR UPDATE OR DELETE ON recipes_tag FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_change_catalog_version('recipes.tag');
+
+CREATE TRIGGER ingredient_catalog_version
+AFTER INSERT OR UPDATE OR DELETE ON recipes_ingredient FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_change_catalog_version('recipes.ingredient');
+
+CREATE TRIGGER recipe_catalog_version
+AFTER INSERT OR DELETE
+OR UPDATE OF name, text, image, cooking_time, author_id ON recipes_recipe
+FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_change_catalog_version('recipes.recipe');
+
+CREATE TRIGGER recipeingredient_catalog_version
+AFTER INSERT OR UPDATE OR DELETE ON recipes_recipeingredient
+FOR EACH STATEMENT
+EXECUTE FUNCTION recipes_change_catalog_version('recipes.recipe');
+"""
+
+DROP_VERSION_TRIGGERS = """
+DROP TRIGGER tag_catalog_version ON recipes_tag;
+DROP TRIGGER ingredient_catalog_version ON recipes_ingredient;
+DROP TRIGGER recipe_catalog_version ON recipes_recipe;
+DROP TRIGGER recipeingredient_catalog_version ON recipes_recipeingredient;
+DROP FUNCTION recipes_change_catalog_version();
+DROP SEQUENCE recipes_catalogversion_seq;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_author_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('version', models.BigIntegerField(verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия каталога',
+                'verbose_name_plural': 'Версии каталогов',
+            },
+        ),
+        migrations.RunSQL(
+            sql=VERSION_TRIGGERS,
+            reverse_sql=DROP_VERSION_TRIGGERS,
+        ),
+    ]
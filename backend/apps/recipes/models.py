@@ -1,10 +1,18 @@
+import operator
+from functools import reduce
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Lower
 
 User = get_user_model()
 MAX_POSITIVE_VALUE = 32767
 MIN_VALUE = 1
+SEARCH_CONFIG = 'russian'
+SEARCH_FIELDS = {'name': 'A', 'text': 'B'}
 
 
 class Tag(models.Model):
@@ -36,17 +44,29 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                'measurement_unit',
+                name='unique_ingredient_name_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
 
 
 class IngredientAmount(models.Model):
-    """Amount of ingredients."""
+    """
+    Amount of ingredients, not used by recipes anymore.
+
+    Ingredients of recipes are kept in RecipeIngredient, left rows
+    are deleted by delete_ingredient_amounts command.
+    """
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
-        related_name='amounts',
+        related_name='legacy_amounts',
         verbose_name='Ингредиент'
     )
     amount = models.PositiveSmallIntegerField(
@@ -72,10 +92,17 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False,
         verbose_name='Автор'
     )
     text = models.TextField(verbose_name='Описание')
     image = models.ImageField(upload_to='recipes/', verbose_name='Изображение')
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные изображения'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
             MaxValueValidator(MAX_POSITIVE_VALUE),
@@ -85,21 +112,143 @@ class Recipe(models.Model):
     )
     tags = models.ManyToManyField(Tag, verbose_name='Теги')
     ingredients = models.ManyToManyField(
-        IngredientAmount,
-        related_name='in_recipes',
+        Ingredient,
+        through='RecipeIngredient',
+        related_name='recipes',
         verbose_name='Ингредиенты'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в избранное'
+    )
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+            GinIndex(
+                fields=['name'],
+                name='recipe_name_trgm_idx',
+                opclasses=['gin_trgm_ops']
+            ),
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def _get_search_vector(self):
+        """Weighted search vector of name and text."""
+        return reduce(operator.add, (
+            SearchVector(
+                models.Value(getattr(self, field), models.TextField()),
+                config=SEARCH_CONFIG,
+                weight=weight
+            ) for field, weight in SEARCH_FIELDS.items()
+        ))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def image_changed(self) -> bool:
+        """Image is new or changed since recipe was loaded from db."""
+        if self._state.adding:
+            return bool(self.image)
+        loaded_image = getattr(self, '_loaded_image', None)
+        return loaded_image is not None and self.image.name != loaded_image
+
+    def save(self, *args, **kwargs):
+        """
+        Save recipe with search vector of name and text.
+
+        Favorites count and image variants are changed only by database
+        and image worker and are not overwritten, variants of changed
+        image are dropped until worker makes new ones.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ('favorites_count', 'image_variants')
+            ]
+            kwargs['update_fields'] = update_fields
+        if update_fields is None or SEARCH_FIELDS.keys() & set(update_fields):
+            self.search_vector = self._get_search_vector()
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {
+                    *update_fields, 'search_vector'
+                }
+        if (
+            (update_fields is None or 'image' in update_fields)
+            and self.image_changed()
+        ):
+            self.image_variants = {}
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'image_variants'}
+        super().save(*args, **kwargs)
+        self.__dict__.pop('search_vector', None)
+        self._loaded_image = self.image.name
+
     def get_count_in_favorites(self):
-        return self.in_favorite.count()
+        return self.favorites_count
+
+
+class RecipeIngredient(models.Model):
+    """Amount of ingredient in recipe."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recipe_ingredients',
+        db_index=False,
+        verbose_name='Рецепт'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='amounts',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveSmallIntegerField(
+        validators=[
+            MaxValueValidator(MAX_POSITIVE_VALUE),
+            MinValueValidator(MIN_VALUE)
+        ],
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Количество ингредиентов'
+        verbose_name_plural = 'Количество ингредиентов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.ingredient.name} '
+            f'{self.amount}{self.ingredient.measurement_unit}'
+        )
 
 
 class Favorite(models.Model):
@@ -114,6 +263,7 @@ class Favorite(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='in_favorite',
+        db_index=False,
         verbose_name='Рецепт'
     )
 
@@ -126,6 +276,12 @@ class Favorite(models.Model):
                 name='unique_user_recipe_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            )
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -140,6 +296,7 @@ class ShoppingCart(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='in_cart',
+        db_index=False,
         verbose_name='Рецепт'
     )
 
@@ -152,6 +309,72 @@ class ShoppingCart(models.Model):
                 name='unique_user_recipe_in_cart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='cart_recipe_user_idx'
+            )
+        ]
+
+
+class ShoppingListItem(models.Model):
+    """Total amount of ingredient in shopping cart of user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='in_shopping_lists',
+        verbose_name='Ингредиент'
+    )
+    total = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Список покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_in_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} {self.total}'
+
+
+class AuthorCounters(models.Model):
+    """
+    Counters of recipes and followers of user.
+
+    Counters are changed by triggers of database.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики автора'
+        verbose_name_plural = 'Счетчики авторов'
+
+    def __str__(self):
+        return f'{self.user} {self.recipes_count} {self.followers_count}'
 
 
 class Follow(models.Model):
@@ -182,3 +405,25 @@ class Follow(models.Model):
                 check=~models.Q(author=models.F("follower")),
             ),
         ]
+
+
+class CatalogVersion(models.Model):
+    """
+    Version of catalog of model.
+
+    Version is changed by triggers of database on every change of rows,
+    so it is shared by all processes.
+    """
+    model = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Модель'
+    )
+    version = models.BigIntegerField(verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия каталога'
+        verbose_name_plural = 'Версии каталогов'
+
+    def __str__(self):
+        return f'{self.model} {self.version}'
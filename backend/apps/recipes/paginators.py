@@ -0,0 +1,87 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.base import ModelBase
+from django.utils.functional import cached_property
+
+COUNT_TIMEOUT = 60
+
+
+def _get_count_version_key(model: ModelBase) -> str:
+    """Cache key of version of counts for model."""
+    return f'count_version:{model._meta.label_lower}'
+
+
+def get_count_version(model: ModelBase) -> int:
+    """Get version of cached counts for model."""
+    key = _get_count_version_key(model)
+    cache.add(key, 1, None)
+    return cache.get(key, 1)
+
+
+def clear_counts(model: ModelBase) -> None:
+    """Drop cached counts of model after rows changed."""
+    key = _get_count_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_count(queryset: QuerySet) -> int:
+    """Get count of rows in query, cached for each filters combination."""
+    try:
+        sql, params = (
+            queryset.order_by().values('pk').query.sql_with_params()
+        )
+    except EmptyResultSet:
+        return 0
+    digest = md5(repr((sql, params)).encode()).hexdigest()
+    version = get_count_version(queryset.model)
+    key = f'count:{queryset.model._meta.label_lower}:{version}:{digest}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def get_estimated_count(model):
+    """Get count of rows in table estimated by PostgreSQL planner."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row else -1
+
+
+class CountPaginator(Paginator):
+    """
+    Paginator with cached count of filtered query.
+
+    Count of not filtered table with more rows than
+    ESTIMATED_COUNT_THRESHOLD is taken from PostgreSQL planner.
+    """
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        if (
+            threshold
+            and connection.vendor == 'postgresql'
+            and not queryset.query.has_filters()
+        ):
+            estimated_count = get_estimated_count(queryset.model)
+            if estimated_count >= threshold:
+                self.count_is_exact = False
+                return estimated_count
+        return get_count(queryset)
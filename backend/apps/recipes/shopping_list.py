@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, Optional
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from . import models
+
+ITEMS_TABLE = models.ShoppingListItem._meta.db_table
+CART_TABLE = models.ShoppingCart._meta.db_table
+INGREDIENTS_TABLE = models.Ingredient._meta.db_table
+
+
+def get_recipes_totals(recipe_ids: Iterable[int]) -> Dict[int, int]:
+    """Get summed amount of each ingredient in recipes."""
+    return dict(
+        models.RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).order_by().values_list('ingredient_id', 'total')
+    )
+
+
+def get_totals_difference(
+        old_totals: Dict[int, int],
+        new_totals: Dict[int, int]) -> Dict[int, int]:
+    """Get change of ingredients amount between two versions of recipe."""
+    difference = {}
+    for ingredient_id in old_totals.keys() | new_totals.keys():
+        change = (
+            new_totals.get(ingredient_id, 0)
+            - old_totals.get(ingredient_id, 0)
+        )
+        if change:
+            difference[ingredient_id] = change
+    return difference
+
+
+def change_shopping_lists(recipe_id: int, totals: Dict[int, int]) -> None:
+    """
+    Add totals to shopping lists of users with recipe in cart.
+
+    Negative totals are subtracted, items with nothing left are deleted.
+    """
+    if not totals:
+        return
+    values = ', '.join(['(%s, %s)'] * len(totals))
+    values_params = [value for item in totals.items() for value in item]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ITEMS_TABLE} AS item '
+            f'(user_id, ingredient_id, total) '
+            f'SELECT cart.user_id, delta.ingredient_id, delta.total '
+            f'FROM {CART_TABLE} AS cart, '
+            f'(VALUES {values}) AS delta (ingredient_id, total) '
+            f'WHERE cart.recipe_id = %s '
+            f'ON CONFLICT (user_id, ingredient_id) '
+            f'DO UPDATE SET total = item.total + EXCLUDED.total',
+            values_params + [recipe_id]
+        )
+        cursor.execute(
+            f'DELETE FROM {ITEMS_TABLE} AS item '
+            f'USING {CART_TABLE} AS cart '
+            f'WHERE item.user_id = cart.user_id AND item.total <= 0 '
+            f'AND cart.recipe_id = %s',
+            [recipe_id]
+        )
+
+
+def change_shopping_list(user_id: int, totals: Dict[int, int]) -> None:
+    """
+    Add totals to shopping list of one user.
+
+    Cart of user is not read, so it can be changed before or after.
+    """
+    if not totals:
+        return
+    values = ', '.join(['(%s, %s, %s)'] * len(totals))
+    values_params = [
+        value for ingredient_id, total in totals.items()
+        for value in (user_id, ingredient_id, total)
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ITEMS_TABLE} AS item '
+            f'(user_id, ingredient_id, total) VALUES {values} '
+            f'ON CONFLICT (user_id, ingredient_id) '
+            f'DO UPDATE SET total = item.total + EXCLUDED.total',
+            values_params
+        )
+        cursor.execute(
+            f'DELETE FROM {ITEMS_TABLE} WHERE user_id = %s AND total <= 0',
+            [user_id]
+        )
+
+
+def get_shopping_list_version(user_id: int) -> str:
+    """Get hash of items of shopping list of user with their names."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT md5(COALESCE(string_agg(concat_ws(E'\\t', "
+            f'item.ingredient_id, item.total, ingredient.name, '
+            f"ingredient.measurement_unit), E'\\n' "
+            f"ORDER BY item.ingredient_id), '')) "
+            f'FROM {ITEMS_TABLE} AS item '
+            f'JOIN {INGREDIENTS_TABLE} AS ingredient '
+            f'ON ingredient.id = item.ingredient_id '
+            f'WHERE item.user_id = %s',
+            [user_id]
+        )
+        return cursor.fetchone()[0]
+
+
+def add_recipes_to_shopping_list(
+        recipe_ids: Iterable[int],
+        user_id: int) -> None:
+    """Add ingredients of recipes to shopping list of user."""
+    change_shopping_list(user_id, get_recipes_totals(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(
+        recipe_ids: Iterable[int],
+        user_id: int) -> None:
+    """Subtract ingredients of recipes from shopping list of user."""
+    totals = {
+        ingredient_id: -total
+        for ingredient_id, total in get_recipes_totals(recipe_ids).items()
+    }
+    change_shopping_list(user_id, totals)
+
+
+def add_recipe_to_shopping_list(recipe_id: int, user_id: int) -> None:
+    """Add ingredients of recipe to shopping list of user."""
+    add_recipes_to_shopping_list([recipe_id], user_id)
+
+
+def remove_recipe_from_shopping_list(recipe_id: int, user_id: int) -> None:
+    """Subtract ingredients of recipe from shopping list of user."""
+    remove_recipes_from_shopping_list([recipe_id], user_id)
+
+
+def rebuild_shopping_lists(user_id: Optional[int] = None) -> int:
+    """Recalculate shopping lists from shopping carts, return items count."""
+    items = models.ShoppingListItem.objects.all()
+    carts = models.ShoppingCart.objects.all()
+    if user_id is not None:
+        items = items.filter(user_id=user_id)
+        carts = carts.filter(user_id=user_id)
+    totals = models.RecipeIngredient.objects.filter(
+        recipe__in_cart__in=carts
+    ).values(
+        'recipe__in_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    with transaction.atomic():
+        items.delete()
+        created_items = models.ShoppingListItem.objects.bulk_create(
+            (
+                models.ShoppingListItem(
+                    user_id=row['recipe__in_cart__user_id'],
+                    ingredient_id=row['ingredient_id'],
+                    total=row['total'],
+                ) for row in totals.iterator()
+            ),
+            batch_size=1000
+        )
+    return len(created_items)
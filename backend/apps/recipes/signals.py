@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import models
+from .images import schedule_image_variants
+from .shopping_list import (add_recipe_to_shopping_list,
+                            remove_recipe_from_shopping_list)
+from .versions import clear_catalog_version
+
+
+@receiver(post_save, sender=models.ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    """Add ingredients of recipe put in cart to shopping list."""
+    if created:
+        add_recipe_to_shopping_list(instance.recipe_id, instance.user_id)
+
+
+@receiver(post_save, sender=models.Recipe)
+def schedule_variants(sender, instance, created, update_fields, **kwargs):
+    """Make variants of new or changed image of recipe after commit."""
+    if kwargs.get('raw'):
+        return
+    if created:
+        image_changed = bool(instance.image)
+    else:
+        image_changed = (
+            (update_fields is None or 'image' in update_fields)
+            and instance.image_changed()
+        )
+    if image_changed:
+        schedule_image_variants(instance)
+
+
+@receiver(pre_delete, sender=models.ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """Subtract ingredients of recipe taken from cart from shopping list."""
+    remove_recipe_from_shopping_list(instance.recipe_id, instance.user_id)
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_save, sender=models.Ingredient)
+@receiver(post_delete, sender=models.Ingredient)
+@receiver(post_save, sender=models.Recipe)
+@receiver(post_delete, sender=models.Recipe)
+def read_catalog_version(sender, **kwargs):
+    """Read changed version of catalog from db in this process at once."""
+    clear_catalog_version(sender)
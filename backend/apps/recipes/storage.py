@@ -0,0 +1,32 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Storage naming files by sha256 of content.
+
+    Same content is saved once, so url of file never changes
+    and can be cached forever.
+    """
+    def get_content_name(self, name, content):
+        """Name of file in same directory by hash of content."""
+        content_hash = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            content_hash.update(chunk)
+        content.seek(0)
+        digest = content_hash.hexdigest()
+        directory, base_name = os.path.split(name)
+        extension = os.path.splitext(base_name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
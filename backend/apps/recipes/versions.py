@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.base import ModelBase
+
+from . import models
+
+CATALOG_VERSION_TIMEOUT = 5
+VERSION_TABLE = models.CatalogVersion._meta.db_table
+
+
+def _get_catalog_version_key(model: ModelBase) -> str:
+    """Cache key of version of catalog."""
+    return f'catalog_version:{model._meta.label_lower}'
+
+
+def _read_catalog_version(label: str) -> int:
+    """Read version of catalog from db, start it for catalog without one."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT version FROM {VERSION_TABLE} WHERE model = %s',
+            [label]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                f'INSERT INTO {VERSION_TABLE} AS catalog (model, version) '
+                "VALUES (%s, nextval('recipes_catalogversion_seq')) "
+                'ON CONFLICT (model) DO UPDATE SET version = catalog.version '
+                'RETURNING version',
+                [label]
+            )
+            row = cursor.fetchone()
+    return row[0]
+
+
+def get_catalog_version(model: ModelBase) -> str:
+    """
+    Get version of catalog of model.
+
+    Version is changed by triggers of db, so changes made by other
+    processes are seen after CATALOG_VERSION_TIMEOUT seconds at most.
+    """
+    key = _get_catalog_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        version = _read_catalog_version(model._meta.label_lower)
+        cache.set(key, version, CATALOG_VERSION_TIMEOUT)
+    return str(version)
+
+
+def clear_catalog_version(model: ModelBase) -> None:
+    """Read version of catalog from db again after rows changed here."""
+    key = _get_catalog_version_key(model)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
 
+from ..recipes.paginators import CountPaginator
+
 User = get_user_model()
 admin.site.unregister(User)
 admin.site.unregister(Group)
@@ -11,4 +13,27 @@ admin.site.unregister(Group)
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     """Admin for User model."""
-    list_filter = ('email', 'username')
+    list_display = (
+        'username', 'email', 'first_name', 'last_name', 'is_staff',
+        'recipes_count', 'followers_count',
+    )
+    list_select_related = ('counters',)
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    paginator = CountPaginator
+    show_full_result_count = False
+
+    @admin.display(
+        description='Рецептов',
+        ordering='counters__recipes_count'
+    )
+    def recipes_count(self, obj):
+        counters = getattr(obj, 'counters', None)
+        return counters.recipes_count if counters else 0
+
+    @admin.display(
+        description='Подписчиков',
+        ordering='counters__followers_count'
+    )
+    def followers_count(self, obj):
+        counters = getattr(obj, 'counters', None)
+        return counters.followers_count if counters else 0
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -99,6 +100,26 @@ DATABASES = {
     }
 }
 
+# Cache, should be shared between workers of gunicorn
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Not filtered lists of tables with more rows use count of PostgreSQL planner
+ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ESTIMATED_COUNT_THRESHOLD', 0))
+
+# Font with cyrillic letters for shopping cart in pdf
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -138,5 +159,21 @@ if DEBUG:
 else:
     MEDIA_ROOT = '/media/'
 
+# Uploaded files are named by hash of content and never change
+STORAGES = {
+    'default': {
+        'BACKEND': 'apps.recipes.storage.ContentHashStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Max size of decoded image of recipe in bytes
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 5 * 1024 * 1024))
+
+# Count of processes making resized variants of recipe images
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', 2))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'